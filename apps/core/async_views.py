@@ -0,0 +1,47 @@
+"""
+Async API views for the ASGI deployment mode.
+
+DRF 3.14 only dispatches to synchronous handlers. AsyncAPIView accepts
+`async def` handlers: authentication, permission and throttle checks still
+run synchronously (they may hit the database) in the request's worker
+thread, while the handler itself runs on the event loop and awaits the
+async ORM API, or sync_to_async, for anything that blocks.
+
+Under WSGI the same views keep working; Django runs them in an event loop
+per request.
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose HTTP method handlers are coroutines. Django recognises
+    the view as async from its handlers (OPTIONS stays synchronous).
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = handler(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,123 @@
+"""
+Statistics counters.
+
+Row counts for the statistics endpoints are kept in the counters table and
+adjusted by signal receivers (apps.core.signals) in the same transaction as
+the change they count, so reading them is a primary key lookup instead of a
+COUNT over the table. Bulk operations such as QuerySet.update() bypass the
+signals; reconcile() recomputes every counter to fix any drift and is run
+periodically by the reconcile_counters task.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.utils import timezone
+
+from apps.organizations.models import Organization, Subscription
+
+from .models import Counter
+
+User = get_user_model()
+
+USERS = "users"
+ORGANIZATIONS = "organizations"
+SUBSCRIPTIONS = "subscriptions"
+ACTIVE_SUBSCRIPTIONS = "subscriptions:active"
+EXPIRED_SUBSCRIPTIONS = "subscriptions:expired"
+
+ORGANIZATION_SUBSCRIPTIONS_PREFIX = "organization:"
+ORGANIZATION_SUBSCRIPTIONS_SUFFIX = ":subscriptions"
+
+GLOBAL_COUNTERS = {
+    USERS: lambda: User.objects.count(),
+    ORGANIZATIONS: lambda: Organization.objects.count(),
+    SUBSCRIPTIONS: lambda: Subscription.objects.count(),
+    ACTIVE_SUBSCRIPTIONS: lambda: Subscription.objects.filter(has_expired=False).count(),
+    EXPIRED_SUBSCRIPTIONS: lambda: Subscription.objects.filter(has_expired=True).count(),
+}
+
+
+def organization_subscriptions(organization_id):
+    return f"{ORGANIZATION_SUBSCRIPTIONS_PREFIX}{organization_id}{ORGANIZATION_SUBSCRIPTIONS_SUFFIX}"
+
+
+def subscription_counters(has_expired, organization_id):
+    """Names of the counters that include a subscription in this state."""
+    return [
+        SUBSCRIPTIONS,
+        EXPIRED_SUBSCRIPTIONS if has_expired else ACTIVE_SUBSCRIPTIONS,
+        organization_subscriptions(organization_id),
+    ]
+
+
+def compute(name):
+    """Count the rows behind a counter directly."""
+    if name in GLOBAL_COUNTERS:
+        return GLOBAL_COUNTERS[name]()
+    if name.startswith(ORGANIZATION_SUBSCRIPTIONS_PREFIX) and name.endswith(
+        ORGANIZATION_SUBSCRIPTIONS_SUFFIX
+    ):
+        organization_id = name[
+            len(ORGANIZATION_SUBSCRIPTIONS_PREFIX):-len(ORGANIZATION_SUBSCRIPTIONS_SUFFIX)
+        ]
+        return Subscription.objects.filter(organization_id=organization_id).count()
+    raise KeyError(f"Unknown counter: {name}")
+
+
+def increment(names, by=1):
+    """
+    Adjust counters in one UPDATE. Counters that have never been read do not
+    exist yet and are left alone; they are computed on first read.
+    """
+    if names and by:
+        Counter.objects.filter(name__in=set(names)).update(
+            value=F("value") + by, updated_at=timezone.now()
+        )
+
+
+def decrement(names):
+    increment(names, by=-1)
+
+
+def get_counters(names):
+    """
+    Return {name: value} for the given counters in one query. Counters that
+    do not exist yet are computed and stored.
+    """
+    values = dict(Counter.objects.filter(name__in=names).values_list("name", "value"))
+    missing = [name for name in names if name not in values]
+    if missing:
+        created = [Counter(name=name, value=compute(name)) for name in missing]
+        Counter.objects.bulk_create(created, ignore_conflicts=True)
+        values.update((counter.name, counter.value) for counter in created)
+    return values
+
+
+def reconcile():
+    """
+    Recompute every counter from the source tables and store the result.
+    Returns the names of the counters that had drifted.
+    """
+    actual = {name: count() for name, count in GLOBAL_COUNTERS.items()}
+    for organization_id in Organization.objects.values_list("id", flat=True):
+        actual[organization_subscriptions(organization_id)] = 0
+    per_organization = Subscription.objects.values("organization_id").annotate(
+        total=Count("id")
+    )
+    for row in per_organization:
+        actual[organization_subscriptions(row["organization_id"])] = row["total"]
+
+    stored = dict(Counter.objects.values_list("name", "value"))
+    drifted = sorted(
+        name for name, value in actual.items() if name in stored and stored[name] != value
+    )
+
+    now = timezone.now()
+    Counter.objects.bulk_create(
+        [Counter(name=name, value=value, updated_at=now) for name, value in actual.items()],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["value", "updated_at"],
+    )
+    # Counters of deleted organizations
+    Counter.objects.exclude(name__in=actual).delete()
+    return drifted
@@ -0,0 +1,111 @@
+"""
+PostgreSQL backend that borrows connections from an in-process pool.
+
+Meant for ASGI and threaded workers, where CONN_MAX_AGE would keep one
+connection open per thread. Django still "closes" its connection at the
+end of every request (use CONN_MAX_AGE 0); closing hands the connection
+back to the pool instead of disconnecting, so the next request skips the
+TCP, TLS and authentication handshake.
+
+Configured with a POOL entry in the database settings:
+
+    "POOL": {"max_size": 10, "timeout": 10}
+
+max_size caps the open connections per process; a request that finds
+every connection in use waits up to timeout seconds for one.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.db.utils import OperationalError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout):
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self, connect, health_check):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError("Timed out waiting for a pooled database connection")
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return connect()
+                if not connection.closed and (not health_check or is_usable(connection)):
+                    return connection
+                discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        try:
+            if not connection.closed:
+                if connection.info.transaction_status != 0:  # not idle
+                    connection.rollback()
+                with self._lock:
+                    self._idle.append(connection)
+        except Exception:
+            discard(connection)
+        finally:
+            self._slots.release()
+
+
+def is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if not connection.autocommit:
+            connection.rollback()
+    except Exception:
+        return False
+    return True
+
+
+def discard(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def get_pool(alias, options):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                max_size=options.get("max_size", 10),
+                timeout=options.get("timeout", 10),
+            )
+        return _pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get("POOL", {}))
+
+    def get_new_connection(self, conn_params):
+        # Normally set while opening a connection; reused ones need it too
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        return self.pool.acquire(
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            health_check=self.settings_dict["CONN_HEALTH_CHECKS"],
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
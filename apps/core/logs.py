@@ -0,0 +1,259 @@
+"""
+Non-blocking structured logging.
+
+Log calls made while handling a request only copy the record onto an
+in-memory queue. A listener thread in each process formats the records as
+JSON lines (with the request id and view name of the request that produced
+them) and writes them to the log file, rotating it by size. Traceback
+formatting, disk writes and rotation all happen on that thread.
+
+RequestContextMiddleware assigns the request id, taken from the
+X-Request-ID header when the proxy sets one, and echoes it in the response.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from .metrics import get_view_name
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Incoming ids are trusted only if they look like ids
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_context = ContextVar("request_context", default=None)
+
+# LogRecord attributes that are not user extras
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "view_name"}
+
+
+def get_request_id():
+    context = request_context.get()
+    return context["request_id"] if context else None
+
+
+class RequestContextMiddleware:
+    """
+    Tag everything logged during a request with its id and view name.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_id = self.start(request)
+        response = self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self.start(request)
+        response = await self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def start(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        # Left set until the response is closed (see clear_request_context),
+        # so the handler's own logging of error responses is tagged too
+        request_context.set({"request_id": request_id, "view": None})
+        return request_id
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        context = request_context.get()
+        if context is not None:
+            context["view"] = get_view_name(request)
+
+
+@receiver(request_finished)
+def clear_request_context(**kwargs):
+    request_context.set(None)
+
+
+class RequestContextFilter(logging.Filter):
+    """Copy the current request id and view name onto each record."""
+
+    def filter(self, record):
+        context = request_context.get()
+        record.request_id = context["request_id"] if context else None
+        record.view_name = context["view"] if context else None
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line. Extra attributes are included when they are
+    plain values; objects such as the request are left out.
+    """
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "view": getattr(record, "view_name", None),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and isinstance(value, (str, int, float, bool, type(None))):
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+class ReopeningRotatingFileHandler(RotatingFileHandler):
+    """
+    Size-rotated log file shared by several worker processes: when another
+    process has rotated the file, reopen it instead of writing to the old one.
+    """
+
+    def _open(self):
+        stream = super()._open()
+        self._stat = os.fstat(stream.fileno())
+        return stream
+
+    def emit(self, record):
+        if self.stream is not None:
+            try:
+                current = os.stat(self.baseFilename)
+                if (current.st_dev, current.st_ino) != (self._stat.st_dev, self._stat.st_ino):
+                    self.stream.close()
+                    self.stream = None
+            except FileNotFoundError:
+                self.stream.close()
+                self.stream = None
+        super().emit(record)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Hand records to a listener thread that writes them as JSON lines to
+    filename (rotated at max_bytes, keeping backup_count files) and, with
+    stream, to stdout.
+
+    The queue is bounded: when the listener falls behind, records are
+    dropped rather than blocking the request, and the number dropped is
+    logged once there is room again. The listener is started lazily in
+    each process, so handlers configured before a fork keep working.
+    """
+
+    def __init__(self, filename=None, max_bytes=0, backup_count=0, stream=False, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.queue_size = queue_size
+        self.targets = []
+        if filename:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self.targets.append(
+                ReopeningRotatingFileHandler(
+                    filename, maxBytes=max_bytes, backupCount=backup_count, delay=True
+                )
+            )
+        if stream:
+            self.targets.append(logging.StreamHandler(sys.stdout))
+        for target in self.targets:
+            target.setFormatter(JSONFormatter())
+        self.listener = None
+        self.listener_pid = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.listener_pid == os.getpid():
+                return
+            # Threads do not survive a fork: start over with a fresh queue
+            if self.listener_pid is not None:
+                self.queue = queue.Queue(maxsize=self.queue_size)
+            self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self.listener.start()
+            self.listener_pid = os.getpid()
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare, leave exc_info for the listener to
+        # format; only merge the arguments now, while they are unchanged
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.listener_pid != os.getpid():
+            self.start()
+        try:
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.queue.put_nowait(
+                    logging.makeLogRecord(
+                        {
+                            "name": __name__,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": f"Log queue full, dropped {dropped} records",
+                        }
+                    )
+                )
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Flush what is queued before the process exits
+        with self.start_lock:
+            if self.listener is not None and self.listener_pid == os.getpid():
+                self.listener.stop()
+                self.listener = None
+                self.listener_pid = None
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+class TracebackSampler:
+    """
+    Rate limit tracebacks of expected errors: at most one per key (e.g. view
+    and exception class) every interval seconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last_logged = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, key):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_logged.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            self._last_logged[key] = now
+            return True
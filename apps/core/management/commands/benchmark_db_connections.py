@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+from apps.core.db.backends.postgresql_pool.base import (
+    DatabaseWrapper as PooledDatabaseWrapper,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request database latency with a new connection per "
+        "request, persistent connections and the connection pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Simulated requests per mode"
+        )
+        parser.add_argument(
+            "--database", default="default", help="Database alias to benchmark"
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options["database"]].settings_dict
+        if "postgresql" not in settings_dict["ENGINE"]:
+            raise CommandError("This benchmark requires a PostgreSQL database")
+
+        modes = [
+            ("New connection per request", DatabaseWrapper, {"CONN_MAX_AGE": 0}),
+            ("Persistent connection", DatabaseWrapper, {"CONN_MAX_AGE": 600}),
+            ("Connection pool", PooledDatabaseWrapper, {"CONN_MAX_AGE": 0, "POOL": {}}),
+        ]
+        baseline = None
+        for label, wrapper_class, overrides in modes:
+            wrapper = wrapper_class(
+                {**settings_dict, **overrides}, alias=f"benchmark-{wrapper_class.__module__}"
+            )
+            timings = self.run_requests(wrapper, options["requests"])
+            wrapper.close()
+
+            mean = statistics.mean(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(f"{label}:")
+            self.stdout.write(f"  Mean: {mean:.2f} ms")
+            self.stdout.write(f"  Median: {statistics.median(timings):.2f} ms")
+            self.stdout.write(f"  p95: {p95:.2f} ms")
+            if baseline is None:
+                baseline = mean
+            else:
+                self.stdout.write(f"  Saved per request: {baseline - mean:.2f} ms")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark completed successfully"))
+
+    def run_requests(self, wrapper, count):
+        """
+        Time count simulated requests, each running SELECT 1 between the
+        connection housekeeping Django does on request_started and
+        request_finished. Returns the timings in milliseconds.
+        """
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            wrapper.close_if_unusable_or_obsolete()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,137 @@
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from apps.users.models import User
+
+BENCHMARK_EMAIL = "benchmark@timber.local"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the WSGI (sync workers) "
+        "and ASGI (Uvicorn workers) server modes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per mode")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--workers", type=int, default=3, help="Gunicorn workers per mode")
+        parser.add_argument(
+            "--path", default="/api/v1/health/", help="Endpoint to request, as a benchmark user"
+        )
+        parser.add_argument("--method", default="GET", help="HTTP method")
+        parser.add_argument("--body", default=None, help="JSON request body")
+        parser.add_argument(
+            "--modes", default="wsgi,asgi", help="Comma-separated server modes to run"
+        )
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        if "asgi" in modes and importlib.util.find_spec("uvicorn") is None:
+            raise CommandError("The asgi mode requires uvicorn (pip install -r requirements.txt)")
+        if settings.DATABASES["default"]["NAME"] == ":memory:":
+            raise CommandError("The servers need a database they can share with this command")
+
+        user, _ = User.objects.get_or_create(
+            email=BENCHMARK_EMAIL, defaults={"username": "benchmark", "is_email_verified": True}
+        )
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {"Authorization": f"Token {token.key}", "Content-Type": "application/json"}
+        body = json.dumps(json.loads(options["body"])).encode() if options["body"] else None
+
+        baseline = None
+        for mode in modes:
+            port = get_free_port()
+            server = self.start_server(mode, port, options["workers"])
+            try:
+                url = f"http://127.0.0.1:{port}{options['path']}"
+                wall, timings, errors = self.run_requests(
+                    url, options["method"], headers, body, options["requests"], options["concurrency"]
+                )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+            throughput = options["requests"] / wall
+            self.stdout.write(f"{mode.upper()}:")
+            self.stdout.write(f"  Throughput: {throughput:.1f} requests/s")
+            self.stdout.write(f"  Median: {statistics.median(timings):.2f} ms")
+            self.stdout.write(f"  p95: {statistics.quantiles(timings, n=20)[-1]:.2f} ms")
+            self.stdout.write(f"  Errors: {errors}")
+            if baseline is None:
+                baseline = throughput
+            else:
+                self.stdout.write(f"  Relative throughput: {throughput / baseline:.2f}x")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark completed successfully"))
+
+    def start_server(self, mode, port, workers):
+        env = {
+            **os.environ,
+            "SERVER_MODE": mode,
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+            "GUNICORN_WORKERS": str(workers),
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "timber_be.settings"),
+        }
+        # gunicorn.conf.py clears this directory on start; leave it to the real server
+        env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", str(settings.BASE_DIR / "gunicorn.conf.py")],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"The {mode} server exited with status {server.returncode}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/livez", timeout=1)
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"The {mode} server did not become ready")
+
+    def run_requests(self, url, method, headers, body, count, concurrency):
+        """
+        Send count requests with concurrency in flight. Returns the wall
+        time in seconds, the per-request timings in milliseconds and the
+        number of failed requests.
+        """
+        def send(_):
+            request = urllib.request.Request(url, data=body, headers=headers, method=method)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    failed = response.status >= 400
+            except (urllib.error.URLError, OSError):
+                failed = True
+            return (time.perf_counter() - start) * 1000, failed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, range(count)))
+        wall = time.perf_counter() - start
+        return wall, [timing for timing, _ in results], sum(failed for _, failed in results)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,105 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+
+from apps.core.uuids import uuid7
+
+BENCHMARK_TABLE = "benchmark_uuid_keys"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure insert throughput and primary key index size with random "
+        "(version 4) and time-ordered (version 7) UUID keys"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=200000, help="Rows inserted per key version"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows inserted per transaction"
+        )
+        parser.add_argument(
+            "--database", default="default", help="Database alias to benchmark"
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError("This benchmark requires PostgreSQL or SQLite")
+
+        baseline = None
+        for label, generate in (("UUID v4 (random)", uuid.uuid4), ("UUID v7 (time-ordered)", uuid7)):
+            self.create_table(connection)
+            try:
+                elapsed = self.insert_rows(
+                    connection, generate, options["rows"], options["batch_size"]
+                )
+                index_size = self.get_index_size(connection)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {BENCHMARK_TABLE}")
+
+            throughput = options["rows"] / elapsed
+            self.stdout.write(f"{label}:")
+            self.stdout.write(f"  Inserts: {throughput:.0f} rows/s ({elapsed:.2f} s)")
+            if index_size is None:
+                self.stdout.write("  Index size: unavailable")
+            else:
+                self.stdout.write(f"  Index size: {index_size / 1024 / 1024:.2f} MiB")
+            if baseline is None:
+                baseline = (throughput, index_size)
+            else:
+                self.stdout.write(f"  Relative throughput: {throughput / baseline[0]:.2f}x")
+                if index_size is not None and baseline[1]:
+                    self.stdout.write(f"  Relative index size: {index_size / baseline[1]:.2f}x")
+
+        self.stdout.write(self.style.SUCCESS("Benchmark completed successfully"))
+
+    def create_table(self, connection):
+        # Same key column type as the models' UUIDField on each backend
+        key_type = "uuid" if connection.vendor == "postgresql" else "char(32)"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCHMARK_TABLE}")
+            cursor.execute(
+                f"CREATE TABLE {BENCHMARK_TABLE} "
+                f"(id {key_type} PRIMARY KEY, payload varchar(255) NOT NULL)"
+            )
+
+    def insert_rows(self, connection, generate, count, batch_size):
+        """Insert count rows in transactions of batch_size. Returns seconds."""
+        to_db = str if connection.vendor == "postgresql" else (lambda value: value.hex)
+        sql = f"INSERT INTO {BENCHMARK_TABLE} (id, payload) VALUES (%s, %s)"
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            rows = [
+                (to_db(generate()), f"row {offset + i}")
+                for i in range(min(batch_size, count - offset))
+            ]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+        return time.perf_counter() - start
+
+    def get_index_size(self, connection):
+        """Bytes used by the primary key index, or None if not measurable."""
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT pg_relation_size(indexrelid) FROM pg_index "
+                    "WHERE indrelid = %s::regclass AND indisprimary",
+                    [BENCHMARK_TABLE],
+                )
+                return cursor.fetchone()[0]
+            try:
+                # SQLite names the index of a non-integer primary key itself
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s",
+                    [f"sqlite_autoindex_{BENCHMARK_TABLE}_1"],
+                )
+            except DatabaseError:
+                # SQLite built without the dbstat table
+                return None
+            return cursor.fetchone()[0]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.schema import build_schema_artifacts, get_code_version
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema artifacts for the current code version"
+
+    def handle(self, *args, **options):
+        paths = build_schema_artifacts()
+        self.stdout.write(f"Code version {get_code_version()}")
+        for path in paths:
+            self.stdout.write(f"  {path} ({path.stat().st_size} bytes)")
+        self.stdout.write(self.style.SUCCESS("OpenAPI schema built successfully"))
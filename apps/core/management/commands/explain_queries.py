@@ -0,0 +1,252 @@
+import json
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.organizations.models import (
+    Customer,
+    EstimateDetail,
+    EstimateHeader,
+    JobCard,
+    Product,
+    Project,
+)
+from apps.users.models import User
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queries each API endpoint makes against seeded "
+        "data and flag sequential scans. The seed data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=5000, help="Rows seeded per table"
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error when a sequential scan is found",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == "postgresql":
+            find_seq_scans = postgresql_seq_scans
+        elif connection.vendor == "sqlite":
+            find_seq_scans = sqlite_seq_scans
+        else:
+            raise CommandError(f"EXPLAIN is not supported for {connection.vendor}")
+
+        setup_test_environment()
+        flagged = []
+        explained = 0
+        try:
+            # Replicas would not see the uncommitted seed data, and cached
+            # responses would hide the queries
+            with override_settings(
+                DATABASE_REPLICAS=[],
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+            ), transaction.atomic():
+                seeded = seed(options["rows"])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+
+                client = Client(HTTP_AUTHORIZATION=f"Token {seeded['token']}")
+                for method, path, data in get_endpoints(seeded):
+                    explained += 1
+                    with CaptureQueriesContext(connection) as captured:
+                        response = client.generic(
+                            method, path, json.dumps(data) if data else "", "application/json"
+                        )
+                    self.stdout.write(
+                        f"{method} {path}: {response.status_code}, {len(captured)} queries"
+                    )
+                    for query in captured.captured_queries:
+                        sql = query["sql"]
+                        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                            continue
+                        for table in find_seq_scans(connection, sql):
+                            flagged.append((method, path, table))
+                            self.stdout.write(
+                                self.style.WARNING(f"  Sequential scan on {table}: {sql[:200]}")
+                            )
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        if flagged and options["fail_on_seq_scan"]:
+            raise CommandError(f"{len(flagged)} sequential scans found")
+        self.stdout.write(
+            self.style.SUCCESS(f"Explained {explained} endpoints, {len(flagged)} sequential scans")
+        )
+
+
+def postgresql_seq_scans(connection, sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    tables = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            tables.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return tables
+
+
+def sqlite_seq_scans(connection, sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        rows = cursor.fetchall()
+        tables = set(connection.introspection.table_names(cursor))
+    # "SCAN users" (or "SCAN TABLE users" before SQLite 3.36) reads the whole
+    # table; "SCAN users USING INDEX ..." and "SEARCH users ..." do not.
+    # "SCAN CONSTANT ROW" and scans of subqueries and CTEs read no table, so
+    # only names of actual tables are reported.
+    scanned = []
+    for _, _, _, detail in rows:
+        if not detail.startswith("SCAN ") or " USING " in detail:
+            continue
+        words = detail.split()
+        name = words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+        if name in tables:
+            scanned.append(name)
+    return scanned
+
+
+def seed(rows):
+    """
+    Create rows of every API model, spread over a year, and users with API
+    tokens, some with outstanding verification or reset tokens. Returns the
+    keys and ids the endpoints are requested with.
+    """
+    now = timezone.now()
+    batch = uuid.uuid4().hex[:8]
+
+    def created(i):
+        return now - timedelta(minutes=i * 525600 // rows)
+
+    users = User.objects.bulk_create(
+        User(
+            username=f"explain-{batch}-{i}",
+            email=f"explain-{batch}-{i}@timber.local",
+            password="!",
+            email_verification_token=uuid.uuid4() if i % 10 == 0 else None,
+            password_reset_token=uuid.uuid4() if i % 10 == 5 else None,
+            password_reset_expires=now + timedelta(hours=1),
+        )
+        for i in range(rows)
+    )
+    tokens = Token.objects.bulk_create(
+        Token(key=Token.generate_key(), user=user) for user in users
+    )
+
+    customers = Customer.objects.bulk_create(
+        Customer(name=f"Customer {i}", email=f"explain-{batch}-{i}@customer.local")
+        for i in range(rows)
+    )
+    projects = Project.objects.bulk_create(
+        Project(customer=customers[i], name=f"Project {i}") for i in range(rows)
+    )
+    headers = EstimateHeader.objects.bulk_create(
+        EstimateHeader(project=projects[i]) for i in range(rows)
+    )
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {batch} {i}") for i in range(rows)
+    )
+    EstimateDetail.objects.bulk_create(
+        EstimateDetail(
+            estimate_header=headers[i // 2],
+            product=products[i % rows],
+            overall_length=Decimal("10"),
+            overall_breadth=Decimal("2"),
+            overall_height=Decimal("3"),
+            component_name=f"Component {i}",
+            component_length=Decimal("10"),
+            component_breadth=Decimal("2"),
+            component_thickness=Decimal("1"),
+            component_cft=Decimal("0.14"),
+            component_cost_per_cft=Decimal("1200"),
+        )
+        for i in range(rows * 2)
+    )
+    job_cards = JobCard.objects.bulk_create(
+        JobCard(estimate_header=headers[i], product=products[i], job_name=f"Job {i}")
+        for i in range(rows)
+    )
+
+    # auto_now_add cannot be overridden on create
+    for model, objects in (
+        (Customer, customers),
+        (Project, projects),
+        (EstimateHeader, headers),
+        (JobCard, job_cards),
+    ):
+        for i, obj in enumerate(objects):
+            obj.created_at = obj.updated_at = created(i)
+        model.objects.bulk_update(objects, ["created_at", "updated_at"], batch_size=1000)
+
+    return {
+        "token": tokens[0].key,
+        "verification_token": users[10 % rows].email_verification_token,
+        "reset_token": users[5 % rows].password_reset_token,
+        "customer": customers[rows // 2].pk,
+        "project": projects[rows // 2].pk,
+        "estimate_header": headers[rows // 2].pk,
+        "product": products[rows // 2].pk,
+        "job_card": job_cards[rows // 2].pk,
+        "since": (now - timedelta(days=1)).isoformat(),
+    }
+
+
+def get_endpoints(seeded):
+    """(method, path, JSON body) of each endpoint explained."""
+    base = "/api/v1/organizations"
+    endpoints = []
+    for resource, key in (
+        ("customers", "customer"),
+        ("projects", "project"),
+        ("estimate-headers", "estimate_header"),
+        ("products", "product"),
+        ("job-cards", "job_card"),
+    ):
+        endpoints += [
+            ("GET", f"{base}/{resource}/", None),
+            ("GET", f"{base}/{resource}/?pagination=cursor", None),
+            ("GET", f"{base}/{resource}/?updated_since={seeded['since']}", None),
+            ("GET", f"{base}/{resource}/{seeded[key]}/", None),
+        ]
+    endpoints += [
+        ("GET", "/api/v1/statistics/", None),
+        ("GET", "/api/v1/auth/profile/", None),
+        ("POST", f"/api/v1/auth/verify-email/{seeded['verification_token']}/", None),
+        (
+            "POST",
+            "/api/v1/auth/password-reset/confirm/",
+            {
+                "token": str(seeded["reset_token"]),
+                "new_password": "Explain-Password-123",
+                "new_password_confirm": "Explain-Password-123",
+            },
+        ),
+    ]
+    return endpoints
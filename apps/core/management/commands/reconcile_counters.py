@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the statistics counters from the source tables"
+
+    def handle(self, *args, **options):
+        drifted = reconcile()
+        if drifted:
+            self.stdout.write(self.style.WARNING(f"Drifted counters: {len(drifted)}"))
+            for name in drifted:
+                self.stdout.write(f"  {name}")
+        self.stdout.write(self.style.SUCCESS("Counters reconciled successfully"))
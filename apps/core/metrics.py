@@ -0,0 +1,172 @@
+"""
+Prometheus metrics for HTTP requests.
+
+Under Gunicorn every worker process keeps its own samples. When
+PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) prometheus_client
+writes them to memory-mapped files in that directory and the /metrics view
+merges the files of every worker, so a scrape sees the whole server.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+LABELS = ["view", "method", "status"]
+UNRESOLVED_VIEW = "<unresolved>"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by resolved URL name, method and status class",
+    LABELS,
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds",
+    LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size in bytes (streaming responses are not observed)",
+    LABELS,
+    buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries executed per HTTP request",
+    LABELS,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 500),
+)
+DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per HTTP request, in seconds",
+    LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+class QueryTimer:
+    """Database execute wrapper that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+# The timer of the request being handled. Under ASGI a request's queries run
+# on a worker thread with its own connections, so the timer follows the
+# request's context instead of being attached to the connections up front.
+request_query_timer = ContextVar("request_query_timer", default=None)
+
+
+def time_request_query(execute, sql, params, many, context):
+    timer = request_query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Outermost, so execute_wrapper() blocks, which pop the last wrapper,
+    # never remove it
+    if time_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_request_query)
+
+
+def get_status_class(status_code):
+    return f"{status_code // 100}xx"
+
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNRESOLVED_VIEW
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, response size and database usage per
+    resolved URL name and status class. Must be first in MIDDLEWARE so the
+    latency covers the whole middleware stack. Runs natively under both
+    WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = request_query_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_query_timer.reset(token)
+        observe(request, response, timer, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = request_query_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_query_timer.reset(token)
+        observe(request, response, timer, time.perf_counter() - start)
+        return response
+
+
+def observe(request, response, timer, duration):
+    labels = (
+        get_view_name(request),
+        request.method,
+        get_status_class(response.status_code),
+    )
+    REQUESTS.labels(*labels).inc()
+    LATENCY.labels(*labels).observe(duration)
+    DB_QUERIES.labels(*labels).observe(timer.count)
+    DB_DURATION.labels(*labels).observe(timer.duration)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(*labels).observe(len(response.content))
+
+
+def get_registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """Return the metrics of every worker in the Prometheus text format."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
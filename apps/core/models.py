@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class Counter(models.Model):
+    """
+    A named, incrementally maintained row count. See apps.core.counters.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "counters"
+        verbose_name = "Counter"
+        verbose_name_plural = "Counters"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
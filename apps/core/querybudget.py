@@ -0,0 +1,160 @@
+"""
+Per-request query budgets and N+1 detection for development and tests.
+
+QueryBudgetMiddleware records every query a request runs. It reports
+(a) query shapes repeated at least QUERY_BUDGET_REPEAT_THRESHOLD times,
+the signature of an N+1 loop, and (b) requests that run more queries than
+their view's budget. Budgets are declared with the query_budget decorator
+on function views, a query_budget attribute on class-based views, or by URL
+name in the QUERY_BUDGETS setting, falling back to QUERY_BUDGET_DEFAULT.
+
+Violations are logged as warnings, or raised as QueryBudgetExceeded when
+QUERY_BUDGET_RAISE is on so that a test exercising the URL fails.
+"""
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """
+    Decorator declaring the most queries a function view may run per
+    request. Apply it above @api_view.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_shape(sql):
+    """SQL with parameter lists collapsed, so N+1 loops share one shape."""
+    return WHITESPACE.sub(" ", IN_LIST.sub("IN (...)", sql)).strip()
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts queries by shape."""
+
+    def __init__(self):
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[get_query_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+
+def get_view_budget(view_func):
+    budget = getattr(view_func, "query_budget", None)
+    if budget is None:
+        # Class-based views declare the budget on the class
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        budget = getattr(view_class, "query_budget", None)
+    return budget
+
+
+# The recorder of the request being handled. Under ASGI a request's queries
+# run on a worker thread with its own connections, so the recorder follows
+# the request's context and the wrapper is installed on the connections of
+# whichever thread runs the view.
+request_query_recorder = ContextVar("request_query_recorder", default=None)
+
+
+def record_request_query(execute, sql, params, many, context):
+    recorder = request_query_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder():
+    """Add record_request_query to this thread's connections."""
+    for connection in connections.all():
+        if record_request_query not in connection.execute_wrappers:
+            # Outermost, so execute_wrapper() blocks, which pop the last
+            # wrapper, never remove it
+            connection.execute_wrappers.insert(0, record_request_query)
+
+
+class QueryBudgetMiddleware:
+    """
+    Warn about, or fail on, N+1 query shapes and views over their query
+    budget. Only installed when QUERY_BUDGET_ENABLED is on. Runs natively
+    under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Called on the thread that runs the view, also under ASGI
+        install_query_recorder()
+        request.query_budget = get_view_budget(view_func)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = request_query_recorder.set(recorder)
+        install_query_recorder()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_query_recorder.reset(token)
+        return self.report(request, recorder, response)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = request_query_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_query_recorder.reset(token)
+        return self.report(request, recorder, response)
+
+    def report(self, request, recorder, response):
+        problems = self.check(request, recorder)
+        if problems:
+            message = f"{request.method} {request.path}: " + "; ".join(problems)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def check(self, request, recorder):
+        problems = []
+        for shape, count in recorder.shapes.most_common():
+            if count < settings.QUERY_BUDGET_REPEAT_THRESHOLD:
+                break
+            problems.append(f"query repeated {count} times (possible N+1): {shape}")
+
+        match = getattr(request, "resolver_match", None)
+        budget = settings.QUERY_BUDGETS.get(match.view_name) if match else None
+        if budget is None:
+            budget = getattr(request, "query_budget", None)
+        if budget is None:
+            budget = settings.QUERY_BUDGET_DEFAULT
+        if budget is not None and recorder.count > budget:
+            problems.append(f"{recorder.count} queries, over the budget of {budget}")
+        return problems
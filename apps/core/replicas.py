@@ -0,0 +1,155 @@
+"""
+Read replica routing.
+
+Reads from GET list and report endpoints go to a replica listed in
+DATABASE_REPLICAS; everything else, and every write, goes to the primary.
+Views opt in with a read_replica attribute (class-based views) or the
+use_read_replica decorator (function views).
+
+Replicas lag behind the primary, so a client that has just written is
+pinned to the primary for REPLICA_PIN_SECONDS (read-your-writes). A replica
+that cannot be reached is skipped for REPLICA_RETRY_SECONDS and its reads
+fall back to the primary.
+"""
+import hashlib
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_CACHE_PREFIX = "db:pin:"
+
+# Authentication and session reads always see the primary, so a token or
+# session created a moment ago is never missing on a lagging replica
+PRIMARY_ONLY_APPS = {"auth", "authtoken", "sessions", "users"}
+
+read_database = ContextVar("read_database", default=None)
+_unavailable_until = {}
+
+
+def use_read_replica(view):
+    """Decorator letting a function view's GET requests read from a replica."""
+    view.read_replica = True
+    return view
+
+
+def get_view_uses_replica(view_func):
+    if getattr(view_func, "read_replica", False):
+        return True
+    view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+    return getattr(view_class, "read_replica", False)
+
+
+def get_client_key(request):
+    identity = (
+        request.META.get("HTTP_AUTHORIZATION")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get("REMOTE_ADDR", "")
+    )
+    return PIN_CACHE_PREFIX + hashlib.sha256(identity.encode()).hexdigest()
+
+
+def pin_to_primary(request):
+    cache.set(get_client_key(request), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(request):
+    return cache.get(get_client_key(request)) is not None
+
+
+def get_replica():
+    """
+    Return the alias of a reachable replica, or None to use the primary.
+    """
+    now = time.monotonic()
+    candidates = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if _unavailable_until.get(alias, 0) <= now
+    ]
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            logger.warning(f"Read replica {alias} unavailable: {str(e)}")
+            _unavailable_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen for the current request, if any, and
+    everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Choose the database for a request's reads and pin clients that write to
+    the primary. Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        token = read_database.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            await sync_to_async(pin_to_primary)(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and get_view_uses_replica(view_func)
+            and not is_pinned_to_primary(request)
+        ):
+            read_database.set(get_replica())
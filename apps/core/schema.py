@@ -0,0 +1,184 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is done
+once per code version instead of on every request: by `manage.py
+build_schema` when the image is built, or otherwise by the first request
+that needs it. The result is stored gzipped under OPENAPI_SCHEMA_DIR and
+served as is, with an ETag and cache headers derived from the code version.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import drf_spectacular
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+
+from .querybudget import query_budget
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FORMATS = {
+    "yaml": ("application/vnd.oai.openapi", OpenApiYamlRenderer),
+    "json": ("application/vnd.oai.openapi+json", OpenApiJsonRenderer),
+}
+# Source trees whose contents determine the schema
+SCHEMA_SOURCE_DIRS = ("apps", "timber_be")
+VERSIONED_MAX_AGE = 365 * 24 * 60 * 60
+
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_code_version():
+    """
+    CODE_VERSION when set (e.g. the commit being deployed), otherwise a hash
+    of the Python sources and the drf-spectacular version.
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha256(drf_spectacular.__version__.encode())
+    for directory in SCHEMA_SOURCE_DIRS:
+        for path in sorted((Path(settings.BASE_DIR) / directory).rglob("*.py")):
+            digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def get_artifact_path(schema_format, version=None):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f"openapi-{version or get_code_version()}.{schema_format}.gz"
+
+
+def generate_schema(schema_format):
+    """Introspect the API and return the rendered schema, gzipped."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    _, renderer_class = SCHEMA_FORMATS[schema_format]
+    return gzip.compress(renderer_class().render(schema, renderer_context={}), mtime=0)
+
+
+def write_artifact(path, content):
+    # Write and rename so concurrent workers never read a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".openapi-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_schema_artifacts():
+    """
+    Generate and store the schema in every format for the current code
+    version, removing artifacts of other versions. Returns the paths written.
+    """
+    paths = []
+    for schema_format in SCHEMA_FORMATS:
+        path = get_artifact_path(schema_format)
+        content = generate_schema(schema_format)
+        write_artifact(path, content)
+        _artifacts[path] = content
+        paths.append(path)
+    for stale in Path(settings.OPENAPI_SCHEMA_DIR).glob("openapi-*.gz"):
+        if stale not in paths:
+            stale.unlink(missing_ok=True)
+    return paths
+
+
+def get_schema_artifact(schema_format):
+    """
+    The gzipped schema for the current code version: from memory, then from
+    the artifact on disk, and only generated when neither exists.
+    """
+    path = get_artifact_path(schema_format)
+    content = _artifacts.get(path)
+    if content is not None:
+        return content
+    with _artifacts_lock:
+        content = _artifacts.get(path)
+        if content is None:
+            try:
+                content = path.read_bytes()
+            except FileNotFoundError:
+                content = generate_schema(schema_format)
+                try:
+                    write_artifact(path, content)
+                except OSError as e:
+                    # Read-only file system: keep it for this process only
+                    logger.warning(f"Could not store OpenAPI schema artifact {path}: {e}")
+            _artifacts[path] = content
+    return content
+
+
+def get_schema_format(request):
+    requested = request.GET.get("format")
+    if requested in SCHEMA_FORMATS:
+        return requested
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+@query_budget(0)
+def schema(request, version=None):
+    """
+    OpenAPI schema, YAML by default or JSON with ?format=json. The
+    unversioned URL is revalidated cheaply with its ETag; the versioned one
+    never changes and is cached for a year.
+    """
+    current_version = get_code_version()
+    if version is not None and version != current_version:
+        return HttpResponseRedirect(
+            reverse("schema-versioned", kwargs={"version": current_version})
+            + (f"?{request.GET.urlencode()}" if request.GET else "")
+        )
+
+    schema_format = get_schema_format(request)
+    etag = f'"{current_version}-{schema_format}"'
+    if version is None:
+        cache_control = f"public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}"
+    else:
+        cache_control = f"public, max-age={VERSIONED_MAX_AGE}, immutable"
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = get_schema_artifact(schema_format)
+        content_type, _ = SCHEMA_FORMATS[schema_format]
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(content, content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(content), content_type=content_type)
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
+
+
+class VersionedSchemaURLMixin:
+    """Point the docs pages at the versioned, long-cached schema URL."""
+
+    def get(self, request, *args, **kwargs):
+        self.url = reverse("schema-versioned", kwargs={"version": get_code_version()}) + "?format=json"
+        return super().get(request, *args, **kwargs)
+
+
+class SchemaSwaggerView(VersionedSchemaURLMixin, SpectacularSwaggerView):
+    query_budget = 2
+
+
+class SchemaRedocView(VersionedSchemaURLMixin, SpectacularRedocView):
+    query_budget = 2
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.organizations.models import Organization, Subscription
+
+from . import counters
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def count_created_user(sender, instance=None, created=False, **kwargs):
+    if created:
+        counters.increment([counters.USERS])
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance=None, **kwargs):
+    counters.decrement([counters.USERS])
+
+
+@receiver(post_save, sender=Organization)
+def count_created_organization(sender, instance=None, created=False, **kwargs):
+    if created:
+        counters.increment([counters.ORGANIZATIONS])
+
+
+@receiver(post_delete, sender=Organization)
+def count_deleted_organization(sender, instance=None, **kwargs):
+    counters.decrement([counters.ORGANIZATIONS])
+    counters.Counter.objects.filter(
+        name=counters.organization_subscriptions(instance.pk)
+    ).delete()
+
+
+@receiver(pre_save, sender=Subscription)
+def remember_subscription_state(sender, instance=None, **kwargs):
+    # The counters a subscription belonged to before this save
+    instance._counted_state = None
+    if not instance._state.adding:
+        instance._counted_state = (
+            Subscription.objects.filter(pk=instance.pk)
+            .values_list("has_expired", "organization_id")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Subscription)
+def count_saved_subscription(sender, instance=None, created=False, **kwargs):
+    current = counters.subscription_counters(instance.has_expired, instance.organization_id)
+    previous = getattr(instance, "_counted_state", None)
+    if created or previous is None:
+        counters.increment(current)
+        return
+    previous = counters.subscription_counters(*previous)
+    counters.decrement([name for name in previous if name not in current])
+    counters.increment([name for name in current if name not in previous])
+
+
+@receiver(post_delete, sender=Subscription)
+def count_deleted_subscription(sender, instance=None, **kwargs):
+    counters.decrement(
+        counters.subscription_counters(instance.has_expired, instance.organization_id)
+    )
@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def reconcile_counters():
+    """Recompute the statistics counters, fixing drift from bulk operations."""
+    drifted = counters.reconcile()
+    if drifted:
+        logger.warning(f"Reconciled drifted counters: {', '.join(drifted)}")
@@ -2,6 +2,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path("health/", views.health_check, name="health_check"),
-    path("statistics/", views.api_statistics, name="api_statistics"),
+    path("health/", views.HealthCheckView.as_view(), name="health_check"),
+    path("statistics/", views.StatisticsView.as_view(), name="api_statistics"),
 ]
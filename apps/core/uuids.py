@@ -0,0 +1,35 @@
+"""
+Primary key UUIDs.
+
+Random (version 4) keys land anywhere in a primary key index, so inserts
+touch pages all over it and leave them half full after splits. With
+UUID_PRIMARY_KEY_VERSION=7, new rows get time-ordered keys instead: the
+first 48 bits are the Unix time in milliseconds, the rest random, so
+inserts append to the right-hand end of the index. The column type and
+the API format are the same either way, and existing rows keep their keys.
+
+Version 7 keys reveal when a row was created (to the millisecond). Tokens
+that must not be guessable (email verification, password reset) keep
+using uuid.uuid4.
+"""
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+
+def uuid7():
+    """A version 7 UUID (RFC 9562): millisecond timestamp, then 74 random bits."""
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+def new_primary_key():
+    """Default for UUID primary keys, per UUID_PRIMARY_KEY_VERSION."""
+    if getattr(settings, "UUID_PRIMARY_KEY_VERSION", 4) == 7:
+        return uuid7()
+    return uuid.uuid4()
@@ -1,111 +1,173 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status, permissions
-from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
-from django.contrib.auth import get_user_model
-from apps.organizations.models import Organization, Subscription
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from apps.organizations.models import OrganizationMember
 
-User = get_user_model()
+from . import counters
+from .async_views import AsyncAPIView
+from .metrics import render_metrics
+from .querybudget import query_budget
 
 
-@extend_schema(
-    summary="API Health Check",
-    description="Returns basic API information and health status",
-    responses={200: dict},
-)
-@api_view(["GET"])
-@permission_classes([permissions.IsAuthenticated])
-def health_check(request):
+def get_global_statistics(values=None):
+    """
+    Global row counts from the statistics counters. values may hold
+    counters that were already read; otherwise they are read in one query.
+    """
+    if values is None:
+        values = counters.get_counters(list(counters.GLOBAL_COUNTERS))
+    return {
+        "total_users": values[counters.USERS],
+        "total_organizations": values[counters.ORGANIZATIONS],
+        "total_subscriptions": values[counters.SUBSCRIPTIONS],
+        "active_subscriptions": values[counters.ACTIVE_SUBSCRIPTIONS],
+        "expired_subscriptions": values[counters.EXPIRED_SUBSCRIPTIONS],
+    }
+
+
+@query_budget(0)
+def liveness(request):
+    """
+    Liveness probe: the process is up and serving requests. Does not touch
+    the database or authentication.
+    """
+    return HttpResponse("ok", content_type="text/plain")
+
+
+@query_budget(1)
+def readiness(request):
+    """
+    Readiness probe: the process can reach the database. Runs a single
+    round trip on the connection and nothing else.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        return HttpResponse(
+            "database unavailable", status=503, content_type="text/plain"
+        )
+    return HttpResponse("ok", content_type="text/plain")
+
+
+@query_budget(0)
+def metrics(request):
+    """
+    Prometheus metrics in the text exposition format. Not authenticated:
+    keep it off the public proxy and scrape the application port directly.
+    """
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+class HealthCheckView(AsyncAPIView):
     """
     Dummy listing endpoint that provides basic API information
     and serves as a health check endpoint.
     """
-    data = {
-        "status": "healthy",
-        "message": "Timber BE API is running",
-        "version": "1.0.0",
-        "authenticated_user": {
-            "id": request.user.id,
-            "email": request.user.email,
-            "is_email_verified": request.user.is_email_verified,
-        },
-        "endpoints": {
-            "auth": {
-                "register": "/api/v1/auth/register/",
-                "login": "/api/v1/auth/login/",
-                "logout": "/api/v1/auth/logout/",
-                "profile": "/api/v1/auth/profile/",
-                "verify_email": "/api/v1/auth/verify-email/<token>/",
-                "password_reset": "/api/v1/auth/password-reset/request/",
-                "password_change": "/api/v1/auth/password/change/",
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 10
+
+    @extend_schema(
+        summary="API Health Check",
+        description="Returns basic API information and health status",
+        responses={200: dict},
+    )
+    async def get(self, request):
+        statistics = await sync_to_async(get_global_statistics)()
+        data = {
+            "status": "healthy",
+            "message": "Timber BE API is running",
+            "version": "1.0.0",
+            "authenticated_user": {
+                "id": request.user.id,
+                "email": request.user.email,
+                "is_email_verified": request.user.is_email_verified,
             },
-            "organizations": {
-                "list": "/api/v1/organizations/",
-                "create": "/api/v1/organizations/create/",
-                "detail": "/api/v1/organizations/<id>/",
-                "subscriptions": "/api/v1/organizations/subscriptions/",
+            "endpoints": {
+                "auth": {
+                    "register": "/api/v1/auth/register/",
+                    "login": "/api/v1/auth/login/",
+                    "logout": "/api/v1/auth/logout/",
+                    "profile": "/api/v1/auth/profile/",
+                    "verify_email": "/api/v1/auth/verify-email/<token>/",
+                    "password_reset": "/api/v1/auth/password-reset/request/",
+                    "password_change": "/api/v1/auth/password/change/",
+                },
+                "organizations": {
+                    "list": "/api/v1/organizations/",
+                    "create": "/api/v1/organizations/create/",
+                    "detail": "/api/v1/organizations/<id>/",
+                    "subscriptions": "/api/v1/organizations/subscriptions/",
+                },
+                "docs": {
+                    "swagger": "/api/docs/",
+                    "redoc": "/api/redoc/",
+                    "schema": "/api/schema/",
+                },
             },
-            "docs": {
-                "swagger": "/api/docs/",
-                "redoc": "/api/redoc/",
-                "schema": "/api/schema/",
+            "statistics": {
+                "total_users": statistics["total_users"],
+                "total_organizations": statistics["total_organizations"],
+                "total_subscriptions": statistics["total_subscriptions"],
             },
-        },
-        "statistics": {
-            "total_users": User.objects.count(),
-            "total_organizations": Organization.objects.count(),
-            "total_subscriptions": Subscription.objects.count(),
-        },
-    }
+        }
 
-    return Response(data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
 
 
-@extend_schema(
-    summary="API Statistics",
-    description="Returns detailed statistics about the API usage and data",
-    responses={200: dict},
-)
-@api_view(["GET"])
-@permission_classes([permissions.IsAuthenticated])
-def api_statistics(request):
+class StatisticsView(AsyncAPIView):
     """
     Returns detailed statistics about the API.
     Requires authentication.
     """
-    user = request.user
-
-    # User-specific stats
-    user_organizations = Organization.objects.filter(
-        members__user=user, members__is_active=True
-    ).count()
-
-    user_subscriptions = Subscription.objects.filter(
-        organization__members__user=user, organization__members__is_active=True
-    ).count()
-
-    data = {
-        "user_info": {
-            "id": user.id,
-            "email": user.email,
-            "is_email_verified": user.is_email_verified,
-            "created_at": user.created_at,
-        },
-        "user_statistics": {
-            "organizations_count": user_organizations,
-            "subscriptions_count": user_subscriptions,
-        },
-        "global_statistics": {
-            "total_users": User.objects.count(),
-            "total_organizations": Organization.objects.count(),
-            "total_subscriptions": Subscription.objects.count(),
-            "active_subscriptions": Subscription.objects.filter(
-                has_expired=False
-            ).count(),
-            "expired_subscriptions": Subscription.objects.filter(
-                has_expired=True
-            ).count(),
-        },
-    }
+    permission_classes = [permissions.IsAuthenticated]
+    read_replica = True
+    query_budget = 6
+
+    @extend_schema(
+        summary="API Statistics",
+        description="Returns detailed statistics about the API usage and data",
+        responses={200: dict},
+    )
+    async def get(self, request):
+        user = request.user
+
+        # User-specific stats: the user's active memberships (indexed on user)
+        # plus one counter per organization
+        organization_ids = [
+            organization_id
+            async for organization_id in OrganizationMember.objects.filter(
+                user=user, is_active=True
+            ).values_list("organization_id", flat=True)
+        ]
+        names = list(counters.GLOBAL_COUNTERS) + [
+            counters.organization_subscriptions(organization_id)
+            for organization_id in organization_ids
+        ]
+        values = await sync_to_async(counters.get_counters)(names)
+
+        user_organizations = len(organization_ids)
+        user_subscriptions = sum(
+            values[counters.organization_subscriptions(organization_id)]
+            for organization_id in organization_ids
+        )
+
+        data = {
+            "user_info": {
+                "id": user.id,
+                "email": user.email,
+                "is_email_verified": user.is_email_verified,
+                "created_at": user.created_at,
+            },
+            "user_statistics": {
+                "organizations_count": user_organizations,
+                "subscriptions_count": user_subscriptions,
+            },
+            "global_statistics": get_global_statistics(values),
+        }
 
-    return Response(data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,81 @@
+"""
+Response cache for the product catalog.
+
+Cached responses are keyed by a catalog version stored in the shared cache.
+Saving or deleting a product bumps the version once its transaction
+commits, so every worker stops serving the old entries at once; they are
+never looked up again and expire after PRODUCT_CACHE_TTL seconds. With
+Redis (REDIS_URL) the version is shared by all Gunicorn workers; the local
+memory fallback only suits a single process, as in development and tests.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+PRODUCT_CATALOG_VERSION_KEY = "products:version"
+CACHE_STATUS_HEADER = "X-Cache"
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def get_catalog_version():
+    version = cache.get(PRODUCT_CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so an evicted version never repeats an old one
+        cache.add(PRODUCT_CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(PRODUCT_CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(PRODUCT_CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(PRODUCT_CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_response_cache_key(request):
+    url = request.get_host() + request.get_full_path()
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return f"products:{get_catalog_version()}:{digest}"
+
+
+def cache_catalog_response(view_method):
+    """
+    Decorator for GET view methods of the product endpoints. Caches the
+    response data (not the rendered body, so content negotiation still
+    applies) of successful responses per URL, together with their ETag and
+    Last-Modified so conditional requests are still answered on a hit.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            data, validators = cached
+            last_modified = parse_http_date_safe(validators.get("Last-Modified"))
+            response = get_conditional_response(
+                request, etag=validators.get("ETag"), last_modified=last_modified
+            ) or Response(data)
+            for header, value in validators.items():
+                response[header] = value
+            response[CACHE_STATUS_HEADER] = "HIT"
+            return response
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            validators = {
+                header: response[header]
+                for header in VALIDATOR_HEADERS
+                if response.has_header(header)
+            }
+            cache.set(key, (response.data, validators), settings.PRODUCT_CACHE_TTL)
+        response[CACHE_STATUS_HEADER] = "MISS"
+        return response
+    return wrapper
@@ -0,0 +1,160 @@
+"""
+Server-side pricing of estimates.
+
+The engine works column-wise: the detail lines of an estimate are turned into
+one sequence per input column (length, breadth, thickness, ...) and every
+derived column (CFT, timber cost, line total) is computed in a single pass
+over those sequences. All arithmetic is done in Decimal and every stored
+amount is rounded half-up to two places, matching the DecimalField columns
+it is written to.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+from operator import add, mul
+
+# Component dimensions are entered in inches; 12 * 12 * 12 cubic inches = 1 CFT
+CFT_DIVISOR = Decimal(1728)
+CENT = Decimal("0.01")
+ZERO = Decimal(0)
+
+# Columns of EstimateDetail the engine reads, with the value used when absent
+LINE_COLUMNS = {
+    "component_length": None,
+    "component_breadth": None,
+    "component_thickness": None,
+    "component_cost_per_cft": None,
+    "labor_charges": ZERO,
+    "polishing_charges": ZERO,
+}
+
+# Header charges applied on top of the line subtotal
+HEADER_CHARGES = ("transport_handling_cost", "discount", "approximate_tax")
+
+
+def quantize(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class EstimateCosting:
+    component_cft: list
+    timber_costs: list
+    line_totals: list
+    timber_cost: Decimal
+    labor_charges: Decimal
+    polishing_charges: Decimal
+    subtotal: Decimal
+    transport_handling_cost: Decimal
+    discount: Decimal
+    approximate_tax: Decimal
+    estimated_total: Decimal
+
+    @property
+    def lines(self):
+        return [
+            {"component_cft": cft, "timber_cost": timber_cost, "line_total": line_total}
+            for cft, timber_cost, line_total in zip(
+                self.component_cft, self.timber_costs, self.line_totals
+            )
+        ]
+
+
+def get_columns(details):
+    """
+    Transpose estimate lines (dicts of validated data or EstimateDetail
+    instances) into one list per column in LINE_COLUMNS.
+    """
+    columns = {name: [] for name in LINE_COLUMNS}
+    for detail in details:
+        values = detail if isinstance(detail, dict) else vars(detail)
+        for name, default in LINE_COLUMNS.items():
+            value = values.get(name, default)
+            columns[name].append(Decimal(value if value is not None else ZERO))
+    return columns
+
+
+def price_columns(columns, transport_handling_cost=ZERO, discount=ZERO, approximate_tax=ZERO):
+    """
+    Price an estimate from its detail columns and header charges.
+
+    CFT is length x breadth x thickness / 1728, timber cost is the unrounded
+    CFT x cost per CFT, and a line total adds labour and polishing to the
+    timber cost. The estimate total is the sum of line totals plus transport and tax, less the
+    discount, and never goes below zero.
+    """
+    with localcontext() as context:
+        # Enough precision that only the explicit quantize() calls round
+        context.prec = 40
+
+        volumes = map(
+            mul,
+            map(mul, columns["component_length"], columns["component_breadth"]),
+            columns["component_thickness"],
+        )
+        # Timber cost is priced on the exact volume; only the stored CFT is rounded
+        exact_cft = [volume / CFT_DIVISOR for volume in volumes]
+        component_cft = [quantize(cft) for cft in exact_cft]
+        timber_costs = [
+            quantize(cost)
+            for cost in map(mul, exact_cft, columns["component_cost_per_cft"])
+        ]
+        line_totals = list(
+            map(
+                add,
+                map(add, timber_costs, columns["labor_charges"]),
+                columns["polishing_charges"],
+            )
+        )
+
+        subtotal = sum(line_totals, ZERO)
+        transport_handling_cost = Decimal(transport_handling_cost)
+        discount = Decimal(discount)
+        approximate_tax = Decimal(approximate_tax)
+        estimated_total = max(
+            quantize(subtotal + transport_handling_cost + approximate_tax - discount),
+            ZERO,
+        )
+
+        return EstimateCosting(
+            component_cft=component_cft,
+            timber_costs=timber_costs,
+            line_totals=line_totals,
+            timber_cost=sum(timber_costs, ZERO),
+            labor_charges=sum(columns["labor_charges"], ZERO),
+            polishing_charges=sum(columns["polishing_charges"], ZERO),
+            subtotal=subtotal,
+            transport_handling_cost=transport_handling_cost,
+            discount=discount,
+            approximate_tax=approximate_tax,
+            estimated_total=estimated_total,
+        )
+
+
+def price_estimate(details, **header_charges):
+    """
+    Price a list of estimate lines. header_charges takes the HEADER_CHARGES
+    amounts; missing or None charges count as zero.
+    """
+    charges = {
+        name: header_charges.get(name) or ZERO for name in HEADER_CHARGES
+    }
+    return price_columns(get_columns(details), **charges)
+
+
+def price_stored_estimate(estimate_header, **header_charges):
+    """
+    Price an estimate from its stored lines, reading only the needed columns
+    in one query rather than loading model instances. header_charges
+    overrides the charges stored on the header.
+    """
+    rows = estimate_header.estimate_details.order_by().values_list(*LINE_COLUMNS)
+    columns = dict(zip(LINE_COLUMNS, (list(column) for column in zip(*rows))))
+    if not columns:
+        columns = {name: [] for name in LINE_COLUMNS}
+    return price_columns(
+        columns,
+        **{
+            name: header_charges.get(name, getattr(estimate_header, name)) or ZERO
+            for name in HEADER_CHARGES
+        },
+    )
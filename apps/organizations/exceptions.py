@@ -1,11 +1,17 @@
 import logging
+from django.conf import settings
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import Http404
 
+from apps.core.logs import TracebackSampler
+
 logger = logging.getLogger(__name__)
 
+# Client errors are routine: log their tracebacks only now and then
+client_error_tracebacks = TracebackSampler(settings.LOG_CLIENT_ERROR_TRACEBACK_INTERVAL)
+
 
 def custom_exception_handler(exc, context):
     """
@@ -36,9 +42,13 @@ def custom_exception_handler(exc, context):
         )
     
     # Log the exception even if DRF handled it
+    view_name = context['view'].__class__.__name__
     logger.warning(
-        f"Exception in {context['view'].__class__.__name__}: {str(exc)}",
-        exc_info=True,
+        f"Exception in {view_name}: {str(exc)}",
+        exc_info=(
+            response.status_code >= 500
+            or client_error_tracebacks.should_log((view_name, exc.__class__))
+        ),
         extra={
             'request': context.get('request'),
             'view': context.get('view'),
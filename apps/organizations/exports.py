@@ -0,0 +1,181 @@
+"""
+Streaming CSV and NDJSON exports of estimates and job cards.
+
+Rows are read with QuerySet.iterator(), which uses a server-side cursor on
+PostgreSQL, and each row is encoded and handed to the response as soon as it
+is read, so memory use does not grow with the size of the export.
+
+Under ASGI, Django consumes a synchronous streaming body in a single
+sync_to_async(list) call, which would hold the whole export in memory;
+there the rows are handed over through iter_async() instead, a chunk at a
+time.
+"""
+import csv
+import json
+from datetime import date, datetime
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import EstimateHeader, JobCard
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_CHUNK_SIZE = 2000
+
+# (output key, ORM lookup) pairs
+ESTIMATE_HEADER_FIELDS = (
+    ("id", "id"),
+    ("project", "project_id"),
+    ("project_name", "project__name"),
+    ("status", "status"),
+    ("transport_handling_cost", "transport_handling_cost"),
+    ("discount", "discount"),
+    ("approximate_tax", "approximate_tax"),
+    ("estimated_total", "estimated_total"),
+    ("description", "description"),
+    ("additional_notes", "additional_notes"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+)
+
+ESTIMATE_DETAIL_FIELDS = (
+    ("id", "estimate_details__id"),
+    ("product", "estimate_details__product_id"),
+    ("product_name", "estimate_details__product__name"),
+    ("overall_length", "estimate_details__overall_length"),
+    ("overall_breadth", "estimate_details__overall_breadth"),
+    ("overall_height", "estimate_details__overall_height"),
+    ("labor_charges", "estimate_details__labor_charges"),
+    ("polishing_charges", "estimate_details__polishing_charges"),
+    ("component_name", "estimate_details__component_name"),
+    ("component_length", "estimate_details__component_length"),
+    ("component_breadth", "estimate_details__component_breadth"),
+    ("component_thickness", "estimate_details__component_thickness"),
+    ("component_cft", "estimate_details__component_cft"),
+    ("component_cost_per_cft", "estimate_details__component_cost_per_cft"),
+)
+
+JOB_CARD_FIELDS = (
+    ("id", "id"),
+    ("estimate_header", "estimate_header_id"),
+    ("estimate_header_name", "estimate_header__project__name"),
+    ("job_name", "job_name"),
+    ("description", "description"),
+    ("wood_species", "wood_species"),
+    ("status", "status"),
+    ("location", "location"),
+    ("people", "people"),
+    ("product", "product_id"),
+    ("item_name", "product__name"),
+    ("carpenter_charges", "carpenter_charges"),
+    ("start_date", "start_date"),
+    ("end_date", "end_date"),
+    ("due_date", "due_date"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+)
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+async def iter_async(iterator, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Async iterator over the pieces of a sync export, joined chunk_size at a
+    time. Each chunk is read in the request's sync thread, so the database
+    cursor stays on the connection that opened it.
+    """
+    iterator = iter(iterator)
+    next_chunk = sync_to_async(lambda: "".join(islice(iterator, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def ndjson_line(data):
+    return json.dumps(data, cls=DjangoJSONEncoder) + "\n"
+
+
+def estimate_header_rows(queryset):
+    """One row per estimate line, ordered so the lines of an estimate are adjacent."""
+    lookups = [lookup for _, lookup in ESTIMATE_HEADER_FIELDS + ESTIMATE_DETAIL_FIELDS]
+    return (
+        queryset.order_by("created_at", "id", "estimate_details__created_at")
+        .values_list(*lookups)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def export_estimate_headers_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        [f"estimate_{key}" for key, _ in ESTIMATE_HEADER_FIELDS]
+        + [f"detail_{key}" for key, _ in ESTIMATE_DETAIL_FIELDS]
+    )
+    for row in estimate_header_rows(queryset):
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def export_estimate_headers_ndjson(queryset):
+    header_size = len(ESTIMATE_HEADER_FIELDS)
+    detail_keys = [key for key, _ in ESTIMATE_DETAIL_FIELDS]
+    rows = estimate_header_rows(queryset)
+    for header_values, lines in groupby(rows, key=lambda row: row[:header_size]):
+        estimate = dict(zip((key for key, _ in ESTIMATE_HEADER_FIELDS), header_values))
+        # Estimates without lines come back as a single row of NULL detail columns
+        estimate["details"] = [
+            dict(zip(detail_keys, line[header_size:]))
+            for line in lines
+            if line[header_size] is not None
+        ]
+        yield ndjson_line(estimate)
+
+
+def job_card_rows(queryset):
+    return (
+        queryset.order_by("created_at", "id")
+        .values_list(*(lookup for _, lookup in JOB_CARD_FIELDS))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def export_job_cards_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow([key for key, _ in JOB_CARD_FIELDS])
+    for row in job_card_rows(queryset):
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def export_job_cards_ndjson(queryset):
+    keys = [key for key, _ in JOB_CARD_FIELDS]
+    for row in job_card_rows(queryset):
+        yield ndjson_line(dict(zip(keys, row)))
+
+
+EXPORTERS = {
+    EstimateHeader: {
+        "csv": export_estimate_headers_csv,
+        "ndjson": export_estimate_headers_ndjson,
+    },
+    JobCard: {
+        "csv": export_job_cards_csv,
+        "ndjson": export_job_cards_ndjson,
+    },
+}
@@ -0,0 +1,153 @@
+"""
+Sparse fieldsets for the organizations API.
+
+GET requests may pass ?fields=a,b,c to receive only those fields, and
+?include=details to add the nested estimate lines. Fields that are left out
+are neither serialized nor selected from the database: the queryset is
+narrowed with only(), and joins and prefetches are added only for the
+related data the remaining fields read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+
+FIELDS_QUERY_PARAM = "fields"
+INCLUDE_QUERY_PARAM = "include"
+
+
+def get_list_param(request, name):
+    value = request.query_params.get(name, "")
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def get_requested_fields(request):
+    """
+    Return the set of field names the client asked for, or None when the
+    response should contain every field.
+    """
+    fields = get_list_param(request, FIELDS_QUERY_PARAM)
+    if not fields:
+        return None
+    return fields | get_list_param(request, INCLUDE_QUERY_PARAM)
+
+
+def resolve_source(model, source_attrs):
+    """
+    Map a serializer field source onto the only() lookup that loads it and the
+    select_related() path it needs. Returns None when the source is not a
+    plain chain of forward relations ending in a model field.
+    """
+    lookups = []
+    for index, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if field.many_to_many or field.one_to_many:
+            return None
+
+        is_last = index == len(source_attrs) - 1
+        # A foreign key followed by its target ("customer.id") is just the FK column
+        is_fk_value = (
+            index == len(source_attrs) - 2
+            and field.is_relation
+            and source_attrs[-1] == field.target_field.name
+        )
+        lookups.append(attr)
+        if is_last or is_fk_value:
+            return "__".join(lookups), "__".join(lookups[:-1]) or None
+        if not field.is_relation:
+            return None
+        model = field.related_model
+    return None
+
+
+def optimize_queryset(queryset, serializer, prefetches=None, method_sources=None, restrict=False):
+    """
+    Add the joins and prefetches the serializer's fields need and, with
+    restrict, load only the columns they read.
+
+    prefetches maps nested serializer fields to their prefetch lookup and
+    method_sources maps SerializerMethodFields to the model fields they read.
+    """
+    prefetches = prefetches or {}
+    method_sources = method_sources or {}
+
+    columns = set()
+    select_related = set()
+    prefetch_lookups = []
+    restrictable = restrict
+    for name, field in serializer.fields.items():
+        if name in prefetches:
+            prefetch_lookups.append(prefetches[name])
+            continue
+        if name in method_sources:
+            sources = [method_sources[name]] if isinstance(method_sources[name], str) else method_sources[name]
+        else:
+            sources = [field.source]
+
+        for source in sources:
+            resolved = resolve_source(queryset.model, source.split(".")) if source != "*" else None
+            if resolved is None:
+                restrictable = False
+                continue
+            lookup, related = resolved
+            columns.add(lookup)
+            if related:
+                select_related.add(related)
+
+    if select_related:
+        queryset = queryset.select_related(*sorted(select_related))
+    if prefetch_lookups:
+        queryset = queryset.prefetch_related(*prefetch_lookups)
+    if restrictable:
+        # Ordering and keyset pagination read created_at even when not rendered
+        if any(field.name == "created_at" for field in queryset.model._meta.concrete_fields):
+            columns.add("created_at")
+        queryset = queryset.only(*sorted(columns))
+    return queryset
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin that drops every field not named in context["fields"].
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """
+    Generic view mixin applying ?fields= to GET requests. The serializer
+    class must use SparseFieldsMixin.
+    """
+    # Nested serializer fields and the prefetch lookup that feeds them
+    sparse_prefetches = {}
+    # SerializerMethodFields and the model fields they read
+    sparse_method_sources = {}
+
+    def get_requested_fields(self):
+        if self.request.method != "GET":
+            return None
+        return get_requested_fields(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_requested_fields()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != "GET":
+            return queryset
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        return optimize_queryset(
+            queryset,
+            serializer,
+            prefetches=self.sparse_prefetches,
+            method_sources=self.sparse_method_sources,
+            restrict=self.get_requested_fields() is not None,
+        )
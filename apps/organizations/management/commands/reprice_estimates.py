@@ -0,0 +1,73 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.organizations.models import Product
+from apps.organizations.repricing import REPRICEABLE_STATUSES, reprice_estimates
+
+
+def decimal_argument(value):
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise CommandError(f'"{value}" is not a valid amount')
+    if amount < 0:
+        raise CommandError("Rates cannot be negative")
+    return amount
+
+
+class Command(BaseCommand):
+    help = "Re-price the detail lines of open estimates at a new cost per CFT"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rate",
+            type=decimal_argument,
+            required=True,
+            help="New cost per CFT",
+        )
+        parser.add_argument(
+            "--product", type=str, help="Only re-price lines for this product ID"
+        )
+        parser.add_argument(
+            "--from-rate",
+            type=decimal_argument,
+            help="Only re-price lines currently at this cost per CFT",
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=["draft", "sent", "approved", "rejected"],
+            help=f"Estimate status to include, may be repeated (default: {', '.join(REPRICEABLE_STATUSES)})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without writing anything",
+        )
+
+    def handle(self, *args, **options):
+        product_id = options.get("product")
+        if not product_id and options.get("from_rate") is None:
+            raise CommandError(
+                "Pass --product and/or --from-rate; re-pricing every line at one rate is not supported"
+            )
+        if product_id and not Product.objects.filter(id=product_id).exists():
+            raise CommandError(f'Product "{product_id}" does not exist')
+
+        report = reprice_estimates(
+            options["rate"],
+            product_id=product_id,
+            from_rate=options.get("from_rate"),
+            statuses=options.get("status") or REPRICEABLE_STATUSES,
+            dry_run=options["dry_run"],
+        )
+
+        if report["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run - no changes written"))
+        self.stdout.write(f"  Detail lines: {report['lines']}")
+        self.stdout.write(f"  Estimates: {report['estimates']}")
+        self.stdout.write(f"  Current total: {report['current_total']}")
+        self.stdout.write(f"  New total: {report['new_total']}")
+        if not report["dry_run"]:
+            self.stdout.write(self.style.SUCCESS("Estimates re-priced successfully"))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0006_jobcard_product"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["created_at", "id"], name="customers_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["created_at", "id"], name="projects_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="estimateheader",
+            index=models.Index(
+                fields=["created_at", "id"], name="estimate_hdr_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="jobcard",
+            index=models.Index(
+                fields=["created_at", "id"], name="job_cards_created_id_idx"
+            ),
+        ),
+    ]
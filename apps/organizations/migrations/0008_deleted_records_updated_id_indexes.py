@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:16
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0007_created_id_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeletedRecord",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=100)),
+                ("object_id", models.UUIDField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Deleted Record",
+                "verbose_name_plural": "Deleted Records",
+                "db_table": "deleted_records",
+                "ordering": ["deleted_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="deletedrecord",
+            index=models.Index(
+                fields=["model_name", "deleted_at"], name="deleted_records_model_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["updated_at", "id"], name="customers_updated_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["updated_at", "id"], name="projects_updated_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="estimateheader",
+            index=models.Index(
+                fields=["updated_at", "id"], name="estimate_hdr_updated_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["updated_at", "id"], name="products_updated_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="jobcard",
+            index=models.Index(
+                fields=["updated_at", "id"], name="job_cards_updated_id_idx"
+            ),
+        ),
+    ]
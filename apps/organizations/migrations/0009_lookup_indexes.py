@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0008_deleted_records_updated_id_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["name"], name="products_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="estimatedetail",
+            index=models.Index(
+                fields=["estimate_header", "product", "created_at"],
+                name="estimate_dtl_hdr_product_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:31
+
+import apps.core.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0009_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='deletedrecord',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='estimatedetail',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='estimateheader',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='jobcard',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='organization',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='organizationmember',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0010_primary_key_defaults"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="estimatedetail",
+            index=models.Index(fields=["updated_at"], name="estimate_dtl_updated_idx"),
+        ),
+    ]
@@ -1,13 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-import uuid
+from apps.core.uuids import new_primary_key
 from django.core.validators import MinValueValidator
 
 User = get_user_model()
 
 
 class Organization(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(
@@ -31,7 +31,7 @@ class Organization(models.Model):
 
 
 class Subscription(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     organization = models.ForeignKey(
         Organization, on_delete=models.CASCADE, related_name="subscriptions"
     )
@@ -57,7 +57,7 @@ class OrganizationMember(models.Model):
         ("member", "Member"),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     organization = models.ForeignKey(
         Organization, on_delete=models.CASCADE, related_name="members"
     )
@@ -82,7 +82,7 @@ class OrganizationMember(models.Model):
 
 
 class Customer(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
@@ -95,13 +95,19 @@ class Customer(models.Model):
         verbose_name = "Customer"
         verbose_name_plural = "Customers"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=["created_at", "id"], name="customers_created_id_idx"),
+            # Delta sync over (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="customers_updated_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Project(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     customer = models.ForeignKey(
         Customer, on_delete=models.CASCADE, related_name="projects"
     )
@@ -115,6 +121,12 @@ class Project(models.Model):
         verbose_name = "Project"
         verbose_name_plural = "Projects"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=["created_at", "id"], name="projects_created_id_idx"),
+            # Delta sync over (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="projects_updated_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -128,7 +140,7 @@ class EstimateHeader(models.Model):
         ("rejected", "Rejected"),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     project = models.ForeignKey(
         Project, on_delete=models.CASCADE, related_name="estimate_headers"
     )
@@ -157,13 +169,19 @@ class EstimateHeader(models.Model):
         verbose_name = "Estimate Header"
         verbose_name_plural = "Estimate Headers"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=["created_at", "id"], name="estimate_hdr_created_id_idx"),
+            # Delta sync over (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="estimate_hdr_updated_id_idx"),
+        ]
 
     def __str__(self):
         return f"Estimate for {self.project.name} - {self.get_status_display()}"
 
 
 class Product(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -174,13 +192,19 @@ class Product(models.Model):
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ["name"]
+        indexes = [
+            # Default ordering of the catalog
+            models.Index(fields=["name"], name="products_name_idx"),
+            # Delta sync over (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="products_updated_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class EstimateDetail(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     estimate_header = models.ForeignKey(
         EstimateHeader, on_delete=models.CASCADE, related_name="estimate_details"
     )
@@ -213,6 +237,15 @@ class EstimateDetail(models.Model):
         verbose_name = "Estimate Detail"
         verbose_name_plural = "Estimate Details"
         ordering = ["created_at"]
+        indexes = [
+            # Job card measurements: lines by (estimate_header, product), in order
+            models.Index(
+                fields=["estimate_header", "product", "created_at"],
+                name="estimate_dtl_hdr_product_idx",
+            ),
+            # Newest change to any line (conditional GET validators)
+            models.Index(fields=["updated_at"], name="estimate_dtl_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.component_name} - {self.estimate_header}"
@@ -225,7 +258,7 @@ class JobCard(models.Model):
         ("Completed", "Completed"),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     estimate_header = models.ForeignKey(
         EstimateHeader, on_delete=models.CASCADE, related_name="job_cards"
     )
@@ -259,6 +292,34 @@ class JobCard(models.Model):
         verbose_name = "Job Card"
         verbose_name_plural = "Job Cards"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=["created_at", "id"], name="job_cards_created_id_idx"),
+            # Delta sync over (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="job_cards_updated_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.job_name} - {self.get_status_display()}"
+
+
+class DeletedRecord(models.Model):
+    """
+    Tombstone for a deleted row, so delta syncs can report deletions.
+    """
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
+    model_name = models.CharField(max_length=100)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "deleted_records"
+        verbose_name = "Deleted Record"
+        verbose_name_plural = "Deleted Records"
+        ordering = ["deleted_at"]
+        indexes = [
+            models.Index(fields=["model_name", "deleted_at"], name="deleted_records_model_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id}"
@@ -0,0 +1,143 @@
+"""
+Set-based re-pricing of open estimates after a change in timber rates.
+
+Everything runs as a handful of SQL statements: the new estimate totals are
+computed by the database from the detail lines with the new rate substituted,
+so no EstimateDetail or EstimateHeader instances are loaded into Python. The
+totals follow the same rules as apps.organizations.costing.
+"""
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    Exists,
+    F,
+    Func,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+
+from .costing import CFT_DIVISOR, quantize
+from .models import EstimateDetail, EstimateHeader
+
+REPRICEABLE_STATUSES = ("draft", "sent")
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+class Dividend(Func):
+    """
+    The numerator of a decimal division. Unchanged except on SQLite, which
+    stores whole-number decimals as integers and would divide them with
+    integer division; there it is cast to REAL, the precision Django's
+    DecimalField has on SQLite anyway.
+    """
+    template = "%(expressions)s"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template="CAST(%(expressions)s AS REAL)", **extra_context
+        )
+
+
+def get_line_filter(product_id=None, from_rate=None):
+    """Q object selecting the detail lines whose rate should change."""
+    line_filter = Q()
+    if product_id is not None:
+        line_filter &= Q(product_id=product_id)
+    if from_rate is not None:
+        line_filter &= Q(component_cost_per_cft=from_rate)
+    return line_filter
+
+
+def projected_total(rate, line_filter):
+    """
+    Expression for an EstimateHeader queryset giving its estimated total with
+    the matching lines priced at the new rate. An empty line_filter matches
+    every line.
+    """
+    if line_filter:
+        cost_per_cft = Case(
+            When(line_filter, then=Value(rate, output_field=AMOUNT)),
+            default=F("component_cost_per_cft"),
+            output_field=AMOUNT,
+        )
+    else:
+        cost_per_cft = Value(rate, output_field=AMOUNT)
+    line_total = (
+        # Priced on the exact volume, like costing.price_columns
+        Round(
+            Dividend(
+                F("component_length") * F("component_breadth") * F("component_thickness")
+                * cost_per_cft
+            )
+            / Value(CFT_DIVISOR),
+            2,
+            output_field=AMOUNT,
+        )
+        + F("labor_charges")
+        + F("polishing_charges")
+    )
+    subtotal = (
+        EstimateDetail.objects.filter(estimate_header=OuterRef("pk"))
+        .order_by()
+        .values("estimate_header")
+        .annotate(subtotal=Sum(line_total, output_field=AMOUNT))
+        .values("subtotal")
+    )
+    return Greatest(
+        Coalesce(Subquery(subtotal, output_field=AMOUNT), Value(0, output_field=AMOUNT))
+        + F("transport_handling_cost")
+        + F("approximate_tax")
+        - F("discount"),
+        Value(0, output_field=AMOUNT),
+        output_field=AMOUNT,
+    )
+
+
+def reprice_estimates(rate, product_id=None, from_rate=None, statuses=REPRICEABLE_STATUSES, dry_run=False):
+    """
+    Set component_cost_per_cft to `rate` on every detail line of estimates in
+    `statuses`, optionally only for one product and/or lines currently priced
+    at `from_rate`, and recompute the estimated_total of the affected headers.
+
+    Returns a report with the number of affected lines and estimates and the
+    sum of their totals before and after. With dry_run nothing is written.
+    """
+    line_filter = get_line_filter(product_id, from_rate)
+    lines = EstimateDetail.objects.filter(
+        line_filter, estimate_header__status__in=statuses
+    ).exclude(component_cost_per_cft=rate)
+    headers = EstimateHeader.objects.filter(
+        Exists(lines.filter(estimate_header=OuterRef("pk")))
+    )
+
+    with transaction.atomic():
+        report = headers.annotate(
+            projected_total=projected_total(rate, line_filter)
+        ).aggregate(
+            estimates=Count("pk"),
+            current_total=Coalesce(Sum("estimated_total"), Value(0, output_field=AMOUNT)),
+            new_total=Coalesce(Sum("projected_total"), Value(0, output_field=AMOUNT)),
+        )
+        for total in ("current_total", "new_total"):
+            report[total] = quantize(report[total])
+        report["lines"] = lines.count()
+        report["dry_run"] = dry_run
+
+        if not dry_run and report["lines"]:
+            now = timezone.now()
+            # Headers first: finding them relies on the lines still having the old rate
+            headers.update(
+                estimated_total=projected_total(rate, line_filter), updated_at=now
+            )
+            lines.update(component_cost_per_cft=rate, updated_at=now)
+
+    return report
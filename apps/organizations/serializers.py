@@ -1,5 +1,31 @@
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Organization, Subscription, OrganizationMember, Customer, Project, EstimateHeader, Product, EstimateDetail, JobCard
+from .costing import HEADER_CHARGES, price_estimate, price_stored_estimate
+from .fieldsets import SparseFieldsMixin
+
+
+def resolve_detail_products(details):
+    """
+    Replace the productId of every estimate line with its Product instance,
+    fetching all referenced products in a single query.
+    """
+    product_ids = {detail["productId"] for detail in details if detail.get("productId")}
+    products = Product.objects.in_bulk(product_ids)
+
+    missing = sorted(str(product_id) for product_id in product_ids - products.keys())
+    if missing:
+        raise serializers.ValidationError(
+            f"Product with this ID does not exist: {', '.join(missing)}."
+        )
+
+    for detail in details:
+        product_id = detail.pop("productId", None)
+        if product_id:
+            detail["product"] = products[product_id]
+    return details
 
 
 class FlexibleDateField(serializers.DateField):
@@ -68,7 +94,7 @@ class OrganizationMemberSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "joined_at")
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = (
@@ -88,8 +114,8 @@ class CustomerSerializer(serializers.ModelSerializer):
         return value
 
 
-class ProjectSerializer(serializers.ModelSerializer):
-    customerId = serializers.UUIDField(source="customer.id", read_only=True)
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    customerId = serializers.UUIDField(source="customer_id", read_only=True)
 
     class Meta:
         model = Project
@@ -129,7 +155,7 @@ class ProjectPostSerializer(serializers.ModelSerializer):
         return Project.objects.create(customer=customer, **validated_data)
 
 
-class EstimateHeaderSerializer(serializers.ModelSerializer):
+class EstimateHeaderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     project_name = serializers.CharField(source="project.name", read_only=True)
 
     class Meta:
@@ -148,7 +174,18 @@ class EstimateHeaderSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "estimated_total", "created_at", "updated_at")
+
+    def create(self, validated_data):
+        # A new estimate has no lines yet, so only the header charges count
+        validated_data['estimated_total'] = price_estimate([], **validated_data).estimated_total
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        validated_data['estimated_total'] = price_stored_estimate(
+            instance, **validated_data
+        ).estimated_total
+        return super().update(instance, validated_data)
 
 
 class EstimateHeaderPostSerializer(serializers.ModelSerializer):
@@ -169,7 +206,7 @@ class EstimateHeaderPostSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "estimated_total", "created_at", "updated_at")
 
     def create(self, validated_data):
         project_id = validated_data.pop('projectId')
@@ -178,10 +215,17 @@ class EstimateHeaderPostSerializer(serializers.ModelSerializer):
         except Project.DoesNotExist:
             raise serializers.ValidationError("Project with this ID does not exist.")
         
+        validated_data['estimated_total'] = price_estimate([], **validated_data).estimated_total
         return EstimateHeader.objects.create(project=project, **validated_data)
 
+    def update(self, instance, validated_data):
+        validated_data['estimated_total'] = price_stored_estimate(
+            instance, **validated_data
+        ).estimated_total
+        return super().update(instance, validated_data)
+
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = (
@@ -239,20 +283,8 @@ class EstimateDetailCreateSerializer(serializers.ModelSerializer):
             "component_cft",
             "component_cost_per_cft",
         )
-
-    def validate_productId(self, value):
-        if not Product.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Product with this ID does not exist.")
-        return value
-
-    def create(self, validated_data, estimate_header):
-        product_id = validated_data.pop('productId')
-        product = Product.objects.get(id=product_id)
-        return EstimateDetail.objects.create(
-            estimate_header=estimate_header,
-            product=product,
-            **validated_data
-        )
+        # Computed by the costing engine
+        read_only_fields = ("component_cft",)
 
 
 class EstimateHeaderWithDetailsSerializer(serializers.ModelSerializer):
@@ -275,7 +307,7 @@ class EstimateHeaderWithDetailsSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "estimated_total", "created_at", "updated_at")
 
     def validate_projectId(self, value):
         if not Project.objects.filter(id=value).exists():
@@ -287,29 +319,33 @@ class EstimateHeaderWithDetailsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("At least one estimate detail is required.")
         
         for detail in value:
-            if detail.get('component_cft', 0) < 0:
-                raise serializers.ValidationError("Component CFT must be greater than 0.")
             if detail.get('component_cost_per_cft', 0) < 0:
                 raise serializers.ValidationError("Component cost per CFT must be greater than 0.")
         
-        return value
+        # Validate every productId with one query instead of one per line
+        return resolve_detail_products(value)
 
     def create(self, validated_data):
         project_id = validated_data.pop('projectId')
         details_data = validated_data.pop('details')
         
-        project = Project.objects.get(id=project_id)
-        estimate_header = EstimateHeader.objects.create(project=project, **validated_data)
+        costing = price_estimate(details_data, **validated_data)
+        for detail_data, component_cft in zip(details_data, costing.component_cft):
+            detail_data['component_cft'] = component_cft
+        validated_data['estimated_total'] = costing.estimated_total
         
-        # Create estimate details
-        detail_serializer = EstimateDetailCreateSerializer()
-        for detail_data in details_data:
-            detail_serializer.create(detail_data, estimate_header)
+        with transaction.atomic():
+            # projectId was already checked in validate_projectId
+            estimate_header = EstimateHeader.objects.create(project_id=project_id, **validated_data)
+            EstimateDetail.objects.bulk_create(
+                EstimateDetail(estimate_header=estimate_header, **detail_data)
+                for detail_data in details_data
+            )
         
         return estimate_header
 
 
-class EstimateHeaderWithDetailsReadSerializer(serializers.ModelSerializer):
+class EstimateHeaderWithDetailsReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     project_name = serializers.CharField(source="project.name", read_only=True)
     details = EstimateDetailSerializer(source="estimate_details", many=True, read_only=True)
 
@@ -351,7 +387,7 @@ class EstimateHeaderUpdateSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "estimated_total", "created_at", "updated_at")
 
     def validate_projectId(self, value):
         if value and not Project.objects.filter(id=value).exists():
@@ -367,11 +403,15 @@ class EstimateHeaderUpdateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
+        # The total is always the server's: stored lines plus header charges
+        instance.estimated_total = price_stored_estimate(instance).estimated_total
+        
         instance.save()
         return instance
 
 
 class EstimateDetailUpdateSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(required=False)
     productId = serializers.UUIDField(write_only=True, required=False)
 
     class Meta:
@@ -391,11 +431,7 @@ class EstimateDetailUpdateSerializer(serializers.ModelSerializer):
             "component_cft",
             "component_cost_per_cft",
         )
-
-    def validate_productId(self, value):
-        if value and not Product.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Product with this ID does not exist.")
-        return value
+        read_only_fields = ("component_cft",)
 
 
 class EstimateHeaderWithDetailsUpdateSerializer(serializers.ModelSerializer):
@@ -418,7 +454,7 @@ class EstimateHeaderWithDetailsUpdateSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "created_at", "updated_at")
+        read_only_fields = ("id", "estimated_total", "created_at", "updated_at")
 
     def validate_projectId(self, value):
         if value and not Project.objects.filter(id=value).exists():
@@ -428,50 +464,198 @@ class EstimateHeaderWithDetailsUpdateSerializer(serializers.ModelSerializer):
     def validate_details(self, value):
         if value is not None:
             for detail in value:
-                if detail.get('component_cft', 0) < 0:
-                    raise serializers.ValidationError("Component CFT must be greater than 0.")
                 if detail.get('component_cost_per_cft', 0) < 0:
                     raise serializers.ValidationError("Component cost per CFT must be greater than 0.")
+
+            # Lines are matched to the stored rows by id; lines without an id are new
+            self.existing_details = {
+                detail.id: detail for detail in self.instance.estimate_details.all()
+            } if self.instance else {}
+
+            seen_ids = set()
+            required_fields = [
+                name for name, field in EstimateDetailCreateSerializer().fields.items()
+                if field.required
+            ]
+            for detail in value:
+                detail_id = detail.get('id')
+                if detail_id is None:
+                    missing = [name for name in required_fields if name not in detail]
+                    if missing:
+                        raise serializers.ValidationError(
+                            f"New estimate details require: {', '.join(missing)}."
+                        )
+                    continue
+                if detail_id not in self.existing_details:
+                    raise serializers.ValidationError(
+                        f"Estimate detail {detail_id} does not belong to this estimate."
+                    )
+                if detail_id in seen_ids:
+                    raise serializers.ValidationError(
+                        f"Estimate detail {detail_id} is listed more than once."
+                    )
+                seen_ids.add(detail_id)
+
+            value = resolve_detail_products(value)
         return value
 
     def update(self, instance, validated_data):
         project_id = validated_data.pop('projectId', None)
         details_data = validated_data.pop('details', None)
         
-        # Update project if provided
-        if project_id:
-            project = Project.objects.get(id=project_id)
-            instance.project = project
-        
-        # Update header fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update details if provided
-        if details_data is not None:
-            # Remove existing details
-            instance.estimate_details.all().delete()
+        with transaction.atomic():
+            # Update project if provided
+            if project_id:
+                instance.project_id = project_id
             
-            # Create new details
-            for detail_data in details_data:
-                product_id = detail_data.pop('productId', None)
-                if product_id:
-                    product = Product.objects.get(id=product_id)
-                else:
-                    # Use existing product if not provided
-                    continue
-                
-                EstimateDetail.objects.create(
-                    estimate_header=instance,
-                    product=product,
-                    **detail_data
-                )
+            # Update header fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            
+            # Update details if provided, then re-price the estimate
+            if details_data is not None:
+                costing = self.sync_details(instance, details_data)
+            else:
+                costing = price_stored_estimate(instance)
+            instance.estimated_total = costing.estimated_total
+            instance.save()
         
         return instance
 
+    def sync_details(self, instance, details_data):
+        """
+        Apply the incoming lines as a diff against the stored ones: new lines
+        are inserted, changed lines updated and missing lines deleted, each as
+        one batched statement. Unchanged lines are not written at all.
+        Returns the costing of the resulting set of lines.
+        """
+        existing_details = self.existing_details
+        now = timezone.now()
+
+        to_create = []
+        updated_fields = {'updated_at'}
+        kept_ids = set()
+        changed_ids = set()
+        for detail_data in details_data:
+            detail_id = detail_data.pop('id', None)
+            if detail_id is None:
+                to_create.append(EstimateDetail(estimate_header=instance, **detail_data))
+                continue
+
+            kept_ids.add(detail_id)
+            detail = existing_details[detail_id]
+            for attr, value in detail_data.items():
+                # Compare foreign keys by id to avoid loading the related row
+                if attr == 'product':
+                    attr, value = 'product_id', value.pk
+                if getattr(detail, attr) != value:
+                    setattr(detail, attr, value)
+                    updated_fields.add(attr)
+                    changed_ids.add(detail_id)
+
+        details = [existing_details[detail_id] for detail_id in kept_ids] + to_create
+        costing = price_estimate(
+            details, **{name: getattr(instance, name) for name in HEADER_CHARGES}
+        )
+        for detail, component_cft in zip(details, costing.component_cft):
+            if detail.component_cft != component_cft:
+                detail.component_cft = component_cft
+                if detail.id in existing_details:
+                    updated_fields.add('component_cft')
+                    changed_ids.add(detail.id)
+
+        to_update = [existing_details[detail_id] for detail_id in changed_ids]
+        for detail in to_update:
+            detail.updated_at = now
+
+        deleted_ids = existing_details.keys() - kept_ids
+        if deleted_ids:
+            EstimateDetail.objects.filter(id__in=deleted_ids).delete()
+        if to_update:
+            EstimateDetail.objects.bulk_update(to_update, sorted(updated_fields))
+        if to_create:
+            EstimateDetail.objects.bulk_create(to_create)
+        return costing
+
+
+class EstimateDetailCostingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EstimateDetail
+        fields = (
+            "component_name",
+            "component_length",
+            "component_breadth",
+            "component_thickness",
+            "component_cost_per_cft",
+            "labor_charges",
+            "polishing_charges",
+        )
+        extra_kwargs = {"component_name": {"required": False}}
+
+
+class EstimatePreviewSerializer(serializers.ModelSerializer):
+    details = EstimateDetailCostingSerializer(many=True)
 
-class JobCardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EstimateHeader
+        fields = (
+            "transport_handling_cost",
+            "discount",
+            "approximate_tax",
+            "details",
+        )
+
+
+class EstimateLineCostingSerializer(serializers.Serializer):
+    component_cft = serializers.DecimalField(max_digits=10, decimal_places=2)
+    timber_cost = serializers.DecimalField(max_digits=14, decimal_places=2)
+    line_total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class EstimateCostingSerializer(serializers.Serializer):
+    lines = EstimateLineCostingSerializer(many=True)
+    timber_cost = serializers.DecimalField(max_digits=14, decimal_places=2)
+    labor_charges = serializers.DecimalField(max_digits=14, decimal_places=2)
+    polishing_charges = serializers.DecimalField(max_digits=14, decimal_places=2)
+    subtotal = serializers.DecimalField(max_digits=14, decimal_places=2)
+    transport_handling_cost = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    approximate_tax = serializers.DecimalField(max_digits=12, decimal_places=2)
+    estimated_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+def load_measurements(job_cards):
+    """
+    Fetch the estimate lines behind a batch of job cards in one query,
+    grouped by (estimate_header_id, product_id).
+    """
+    keys = {
+        (job_card.estimate_header_id, job_card.product_id)
+        for job_card in job_cards
+        if job_card.product_id
+    }
+    measurements = {key: [] for key in keys}
+    if not keys:
+        return measurements
+
+    lookup = Q()
+    for estimate_header_id, product_id in keys:
+        lookup |= Q(estimate_header_id=estimate_header_id, product_id=product_id)
+    for detail in EstimateDetail.objects.filter(lookup).order_by("created_at"):
+        measurements[(detail.estimate_header_id, detail.product_id)].append(detail)
+    return measurements
+
+
+class JobCardListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        job_cards = list(data.all() if isinstance(data, models.Manager) else data)
+        # Load the measurements of the whole page up front instead of per job card
+        if "measurements" in self.child.fields:
+            self.child.measurements = load_measurements(job_cards)
+        return super().to_representation(job_cards)
+
+
+class JobCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     estimate_header_name = serializers.CharField(source="estimate_header.project.name", read_only=True)
     measurements = serializers.SerializerMethodField()
     item_name = serializers.CharField(source="product.name", read_only=True, default='')
@@ -498,17 +682,19 @@ class JobCardSerializer(serializers.ModelSerializer):
             "updated_at",
         )
         read_only_fields = ("id", "created_at", "updated_at")
+        list_serializer_class = JobCardListSerializer
 
     def get_measurements(self, obj):
         """Get measurements from estimate details using product reference"""
-        if not obj.product:
+        if not obj.product_id:
             return []
         
-        # Get estimate details for this job card's estimate header and product
-        estimate_details = EstimateDetail.objects.filter(
-            estimate_header=obj.estimate_header,
-            product=obj.product
-        )
+        # Get estimate details for this job card's estimate header and product,
+        # preloaded for the whole page when serializing a list
+        measurements = getattr(self, "measurements", None)
+        if measurements is None:
+            measurements = load_measurements([obj])
+        estimate_details = measurements.get((obj.estimate_header_id, obj.product_id), [])
         
         measurements = []
         for detail in estimate_details:
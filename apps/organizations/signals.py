@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import bump_catalog_version
+from .models import Customer, EstimateHeader, JobCard, Product, Project
+from .sync import record_deletion
+
+SYNCED_MODELS = (Customer, Project, EstimateHeader, Product, JobCard)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_catalog(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(pre_delete, sender=Product)
+def touch_product_job_cards(sender, instance, **kwargs):
+    # on_delete=SET_NULL clears job_cards.product_id with a bulk update that
+    # leaves updated_at alone, which delta syncs would not notice
+    JobCard.objects.filter(product=instance).update(updated_at=timezone.now())
+
+
+for model in SYNCED_MODELS:
+    post_delete.connect(
+        record_deletion, sender=model, dispatch_uid=f"record_deletion_{model._meta.model_name}"
+    )
@@ -0,0 +1,206 @@
+"""
+Delta sync for the organizations list endpoints.
+
+GET ?updated_since=<ISO 8601 timestamp> returns only the rows changed at or
+after that time, walked in (updated_at, id) order over the updated_at index,
+plus the ids of rows deleted since then, read from the deletion log. Each
+response carries a sync_token to pass back as updated_since on the next sync;
+large deltas are split into pages linked by next.
+
+Changes show up on the endpoint of the row that changed: renaming a product
+changes the product, not every estimate or job card that names it.
+"""
+import base64
+import binascii
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import DeletedRecord
+
+UPDATED_SINCE_QUERY_PARAM = "updated_since"
+SYNC_CURSOR_QUERY_PARAM = "sync_cursor"
+PAGE_SIZE_QUERY_PARAM = "page_size"
+
+
+# Tombstones of the deletion in progress, when batched by batch_deletion_records()
+pending_deletion_records = ContextVar("pending_deletion_records", default=None)
+
+
+def record_deletion(sender, instance, **kwargs):
+    """post_delete receiver writing a tombstone for the deleted row."""
+    record = DeletedRecord(model_name=sender._meta.model_name, object_id=instance.pk)
+    pending = pending_deletion_records.get()
+    if pending is None:
+        record.save()
+    else:
+        pending.append(record)
+
+
+@contextmanager
+def batch_deletion_records():
+    """
+    Collect the tombstones of the rows deleted in the block, cascades
+    included, and write them in one statement at the end, in the same
+    transaction as the deletes.
+    """
+    pending = []
+    token = pending_deletion_records.set(pending)
+    try:
+        with transaction.atomic():
+            yield
+            DeletedRecord.objects.bulk_create(pending)
+    finally:
+        pending_deletion_records.reset(token)
+
+
+class BatchedDeletionViewMixin:
+    """Destroy view mixin writing the tombstones of a delete in one statement."""
+
+    def perform_destroy(self, instance):
+        with batch_deletion_records():
+            super().perform_destroy(instance)
+
+
+def prune_deleted_records():
+    """Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = DeletedRecord.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def parse_timestamp(value):
+    try:
+        parsed = parse_datetime(value.replace(" ", "+"))
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def encode_sync_cursor(sync_token, instance):
+    raw = "|".join((sync_token.isoformat(), instance.updated_at.isoformat(), str(instance.pk)))
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+
+def decode_sync_cursor(encoded):
+    """Return (sync_token, updated_at, pk), or None for a malformed cursor."""
+    try:
+        sync_token, updated_at, pk = (
+            base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii").split("|")
+        )
+        sync_token, updated_at, pk = parse_timestamp(sync_token), parse_timestamp(updated_at), uuid.UUID(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+    if sync_token is None or updated_at is None:
+        return None
+    return sync_token, updated_at, pk
+
+
+class DeltaSyncViewMixin:
+    """
+    List view mixin answering GET ?updated_since= with changed rows and
+    tombstones instead of the full list. Deletions are only reported for
+    models whose post_delete signal is connected to record_deletion.
+    """
+    sync_page_size = 200
+    sync_max_page_size = 1000
+
+    def get(self, request, *args, **kwargs):
+        if UPDATED_SINCE_QUERY_PARAM not in request.query_params:
+            return super().get(request, *args, **kwargs)
+        return self.sync(request)
+
+    def get_sync_page_size(self, request):
+        try:
+            requested = int(request.query_params[PAGE_SIZE_QUERY_PARAM])
+        except (KeyError, ValueError):
+            return self.sync_page_size
+        return min(requested, self.sync_max_page_size) if requested > 0 else self.sync_page_size
+
+    def sync(self, request):
+        since = parse_timestamp(request.query_params[UPDATED_SINCE_QUERY_PARAM])
+        if since is None:
+            return Response(
+                {"error": f"{UPDATED_SINCE_QUERY_PARAM} must be an ISO 8601 timestamp"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cursor = None
+        if SYNC_CURSOR_QUERY_PARAM in request.query_params:
+            cursor = decode_sync_cursor(request.query_params[SYNC_CURSOR_QUERY_PARAM])
+            if cursor is None:
+                return Response(
+                    {"error": f"Invalid {SYNC_CURSOR_QUERY_PARAM}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        now = timezone.now()
+        if since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            # Deletions from before the retention window are gone
+            return Response(
+                {"error": f"{UPDATED_SINCE_QUERY_PARAM} is older than the deletion log, run a full sync"},
+                status=status.HTTP_410_GONE,
+            )
+
+        if cursor is None:
+            # Rows written by transactions still open (or not yet on the
+            # replica) may carry an earlier updated_at, so the next sync
+            # starts a little before this one
+            sync_token = now - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        else:
+            sync_token, updated_at, pk = cursor
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(updated_at__gte=since)
+            .order_by("updated_at", "id")
+        )
+        if cursor is not None:
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+        page_size = self.get_sync_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(
+                request.build_absolute_uri(),
+                SYNC_CURSOR_QUERY_PARAM,
+                encode_sync_cursor(sync_token, rows[-1]),
+            )
+
+        deleted = []
+        if cursor is None:
+            deleted = list(
+                DeletedRecord.objects.filter(
+                    model_name=queryset.model._meta.model_name, deleted_at__gte=since
+                )
+                .order_by("deleted_at")
+                .values_list("object_id", flat=True)
+            )
+
+        return Response(
+            OrderedDict(
+                [
+                    ("sync_token", sync_token.isoformat()),
+                    ("next", next_link),
+                    ("results", self.get_serializer(rows, many=True).data),
+                    ("deleted", deleted),
+                ]
+            )
+        )
@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from . import sync
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def prune_deleted_records():
+    """Drop delta sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS."""
+    deleted = sync.prune_deleted_records()
+    if deleted:
+        logger.info(f"Pruned {deleted} deleted records")
@@ -0,0 +1,264 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.core.querybudget import QueryBudgetExceeded, get_view_budget
+from apps.users.authentication import local_token_cache
+
+from .models import Organization, OrganizationMember
+from .tests import create_organization_data
+
+User = get_user_model()
+
+QUERY_BUDGET_MIDDLEWARE = "apps.core.querybudget.QueryBudgetMiddleware"
+
+# URL namespaces served by Django itself rather than this API
+UNBUDGETED_NAMESPACES = {"admin"}
+
+
+def get_routes(patterns=None, namespace=None):
+    """(URL name, view callback) of every route, including included URLconfs."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from get_routes(pattern.url_patterns, pattern.namespace or namespace)
+        elif namespace not in UNBUDGETED_NAMESPACES:
+            yield pattern.name, pattern.callback
+
+
+def line(product, **values):
+    return {
+        "productId": str(product.pk),
+        "overall_length": "72.00",
+        "overall_breadth": "36.00",
+        "overall_height": "30.00",
+        "labor_charges": "250.00",
+        "polishing_charges": "75.00",
+        "component_name": "Leg",
+        "component_length": "30.00",
+        "component_breadth": "3.00",
+        "component_thickness": "3.00",
+        "component_cost_per_cft": "1500.00",
+        **values,
+    }
+
+
+@override_settings(
+    MIDDLEWARE=[
+        name for name in settings.MIDDLEWARE if name != QUERY_BUDGET_MIDDLEWARE
+    ] + [QUERY_BUDGET_MIDDLEWARE],
+    QUERY_BUDGET_RAISE=True,
+    # Every request takes the uncached path: token, catalog and validators
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    CELERY_TASK_ALWAYS_EAGER=True,
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class QueryBudgetTests(TestCase):
+    """
+    Every route declares a query budget and is exercised here, for each of
+    its methods, with several pages of data behind it. A request over its
+    budget, or repeating a query often enough to look like an N+1, raises
+    QueryBudgetExceeded out of the test client and fails the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        cls.token = Token.objects.get_or_create(user=cls.user)[0]
+        # Users whose token or password the requests change
+        cls.leaving_user = User.objects.create_user(
+            email="leaving@example.com", username="leaving", password="password"
+        )
+        cls.unverified_user = User.objects.create_user(
+            email="unverified@example.com", username="unverified", password="password"
+        )
+        cls.verification_token = cls.unverified_user.generate_email_verification_token()
+        cls.unverified_user.save()
+        cls.forgetful_user = User.objects.create_user(
+            email="forgetful@example.com", username="forgetful", password="password"
+        )
+        cls.reset_token = cls.forgetful_user.generate_password_reset_token()
+
+        cls.organization = Organization.objects.create(name="Timber Works", created_by=cls.user)
+        OrganizationMember.objects.create(organization=cls.organization, user=cls.user, role="owner")
+        for index in range(10):
+            member = User.objects.create_user(
+                email=f"member{index}@example.com", username=f"member{index}", password="password"
+            )
+            OrganizationMember.objects.create(organization=cls.organization, user=member)
+
+        cls.products, cls.customers, cls.projects, cls.estimates = create_organization_data()
+        # The customer deleted has several projects, estimates and job cards
+        for project in cls.projects[10:15]:
+            project.customer = cls.customers[3]
+            project.save()
+
+    def setUp(self):
+        local_token_cache.clear()
+        self.client = APIClient()
+
+    def get_requests(self):
+        """
+        (URL name, URL kwargs, method, data, expected status) for every
+        route and method, in an order where each request finds what it
+        needs: the objects deleted are only used by their DELETE.
+        """
+        product, other_product = self.products[:2]
+        customer, project, estimate = self.customers[0], self.projects[0], self.estimates[0]
+        job_card = estimate.job_cards.get()
+        kept, changed, dropped = estimate.estimate_details.order_by("created_at")
+        organization = {"pk": self.organization.pk}
+        return [
+            # Probes and metrics
+            ("livez", {}, "get", None, 200),
+            ("readyz", {}, "get", None, 200),
+            ("metrics", {}, "get", None, 200),
+            ("schema", {}, "get", None, 200),
+            ("schema-versioned", {"version": "stale"}, "get", None, 302),
+            ("swagger-ui", {}, "get", None, 200),
+            ("redoc", {}, "get", None, 200),
+            ("health_check", {}, "get", None, 200),
+            ("api_statistics", {}, "get", None, 200),
+            # Users
+            ("register", {}, "post", {
+                "email": "new@example.com",
+                "username": "new",
+                "password": "a-long-password-1",
+                "password_confirm": "a-long-password-1",
+                "first_name": "New",
+                "last_name": "User",
+            }, 201),
+            ("login", {}, "post", {"email": "estimator@example.com", "password": "password"}, 200),
+            ("profile", {}, "get", None, 200),
+            ("update_profile", {}, "patch", {"first_name": "Estimator"}, 200),
+            ("verify_email", {"token": self.verification_token}, "post", None, 200),
+            ("request_password_reset", {}, "post", {"email": "estimator@example.com"}, 200),
+            ("confirm_password_reset", {}, "post", {
+                "token": str(self.reset_token),
+                "new_password": "a-new-password-1",
+                "new_password_confirm": "a-new-password-1",
+            }, 200),
+            # Organizations and subscriptions
+            ("organization_list", {}, "get", None, 200),
+            ("organization_create", {}, "post", {"name": "Sawmill"}, 201),
+            ("organization_detail", organization, "get", None, 200),
+            ("organization_update", organization, "patch", {"description": "Furniture"}, 200),
+            ("organization_members_list", organization, "get", None, 200),
+            ("subscription_create", {}, "post", {
+                "organization": str(self.organization.pk), "plan_name": "Pro",
+            }, 201),
+            ("subscription_list", {}, "get", None, 200),
+            # Customers
+            ("customer_list_create", {}, "get", {"page": 2}, 200),
+            ("customer_list_create", {}, "post", {"name": "New", "email": "new@example.com"}, 201),
+            ("customer_detail", {"pk": customer.pk}, "get", None, 200),
+            ("customer_detail", {"pk": customer.pk}, "put", {"name": "Renamed", "email": customer.email}, 200),
+            ("customer_detail", {"pk": customer.pk}, "patch", {"phone_number": "5550100"}, 200),
+            # Projects
+            ("project_list_create", {}, "get", {"page": 2}, 200),
+            ("project_list_create", {}, "post", {"customerId": str(customer.pk), "name": "Kitchen"}, 201),
+            ("project_detail", {"pk": project.pk}, "get", None, 200),
+            ("project_detail", {"pk": project.pk}, "put", {"customer": str(customer.pk), "name": "Renamed"}, 200),
+            ("project_detail", {"pk": project.pk}, "patch", {"description": "Second floor"}, 200),
+            # Products
+            ("product_list_create", {}, "get", None, 200),
+            ("product_list_create", {}, "post", {"name": "Walnut"}, 201),
+            ("product_detail", {"pk": product.pk}, "get", None, 200),
+            ("product_detail", {"pk": product.pk}, "put", {"name": "Oak"}, 200),
+            ("product_detail", {"pk": product.pk}, "patch", {"description": "Kiln dried"}, 200),
+            # Estimates: the bulk create, the line diff update, preview and export
+            ("estimate_header_list_create", {}, "get", {"page": 2}, 200),
+            ("estimate_header_list_create", {}, "post", {
+                "projectId": str(project.pk),
+                "transport_handling_cost": "100.00",
+                "details": [line(self.products[index % 5]) for index in range(20)],
+            }, 201),
+            ("estimate_header_list_create", {}, "post", {"projectId": str(project.pk)}, 201),
+            ("estimate_header_preview", {}, "post", {
+                "details": [line(product) for _ in range(20)],
+            }, 200),
+            ("estimate_header_export", {}, "get", {"export_format": "ndjson"}, 200),
+            ("estimate_header_detail", {"pk": estimate.pk}, "get", None, 200),
+            ("estimate_header_detail", {"pk": estimate.pk}, "patch", {
+                "discount": "10.00",
+                "details": [
+                    {"id": str(kept.pk)},
+                    {"id": str(changed.pk), "component_cost_per_cft": "1650.00"},
+                    line(other_product),
+                    line(other_product, component_name="Rail"),
+                ],
+            }, 200),
+            ("estimate_header_detail", {"pk": estimate.pk}, "put", {
+                "project": str(project.pk), "status": "sent",
+            }, 200),
+            # Job cards
+            ("job_card_list_create", {}, "get", {"page": 2}, 200),
+            ("job_card_list_create", {}, "post", {
+                "estimateHeaderId": str(estimate.pk),
+                "product": str(product.pk),
+                "job_name": "Assembly",
+                "people": [{"name": "Carpenter"}],
+            }, 201),
+            ("job_card_export", {}, "get", None, 200),
+            ("job_card_detail", {"pk": job_card.pk}, "get", None, 200),
+            ("job_card_detail", {"pk": job_card.pk}, "put", {
+                "estimateHeaderId": str(estimate.pk),
+                "product": None,
+                "job_name": "Finishing",
+            }, 200),
+            ("job_card_detail", {"pk": job_card.pk}, "patch", {"location": "Workshop"}, 200),
+            # Deletes, of rows nothing later depends on
+            ("job_card_detail", {"pk": job_card.pk}, "delete", None, 204),
+            ("estimate_header_detail", {"pk": self.estimates[1].pk}, "delete", None, 204),
+            ("project_detail", {"pk": self.projects[2].pk}, "delete", None, 204),
+            ("customer_detail", {"pk": self.customers[3].pk}, "delete", None, 204),
+            ("product_detail", {"pk": self.products[4].pk}, "delete", None, 204),
+            # Last, as they end sessions
+            ("change_password", {}, "post", {
+                "old_password": "password",
+                "new_password": "a-new-password-2",
+                "new_password_confirm": "a-new-password-2",
+            }, 200),
+            ("logout", {}, "post", None, 200),
+        ]
+
+    def test_every_route_has_a_budget(self):
+        for name, callback in get_routes():
+            with self.subTest(route=name):
+                budget = settings.QUERY_BUDGETS.get(name, get_view_budget(callback))
+                self.assertIsNotNone(budget, f"{name} has no query budget")
+
+    def test_every_route_is_exercised(self):
+        exercised = {name for name, *_ in self.get_requests()}
+        missing = {name for name, _ in get_routes()} - exercised
+        self.assertEqual(missing, set(), "routes without a request in get_requests()")
+
+    def test_requests_within_budget(self):
+        for name, kwargs, method, data, expected_status in self.get_requests():
+            with self.subTest(route=name, method=method):
+                if name == "logout":
+                    token = Token.objects.get_or_create(user=self.leaving_user)[0]
+                else:
+                    token = self.token
+                self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+                url = reverse(name, kwargs=kwargs)
+                if method == "get":
+                    response = self.client.get(url, data)
+                else:
+                    response = getattr(self.client, method)(url, data, format="json")
+                self.assertEqual(response.status_code, expected_status, getattr(response, "data", None))
+
+    async def test_budget_enforced_under_asgi(self):
+        # The middleware runs natively in the async chain; the view's
+        # queries, run on a worker thread, are still counted
+        client = AsyncClient()
+        headers = {"Authorization": f"Token {self.token.key}"}
+        response = await client.get(reverse("health_check"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        with override_settings(QUERY_BUDGETS={"health_check": 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                await client.get(reverse("health_check"), headers=headers)
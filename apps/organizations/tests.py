@@ -0,0 +1,513 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from .costing import price_estimate, price_stored_estimate
+from .models import Customer, DeletedRecord, EstimateDetail, EstimateHeader, JobCard, Product, Project
+from .repricing import get_line_filter, projected_total
+
+User = get_user_model()
+
+# Enough rows for several full pages of every list
+PAGES = 3
+ROWS = api_settings.PAGE_SIZE * PAGES
+
+
+def create_organization_data(rows=ROWS, lines_per_estimate=3):
+    """
+    Customers, projects, estimates with detail lines and job cards, `rows` of
+    each, spread over a handful of products.
+    """
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {index}") for index in range(5)
+    )
+    customers = Customer.objects.bulk_create(
+        Customer(name=f"Customer {index}", email=f"customer{index}@example.com")
+        for index in range(rows)
+    )
+    projects = Project.objects.bulk_create(
+        Project(customer=customer, name=f"Project {index}")
+        for index, customer in enumerate(customers)
+    )
+    estimates = EstimateHeader.objects.bulk_create(
+        EstimateHeader(project=project, transport_handling_cost=Decimal("10.00"))
+        for project in projects
+    )
+    EstimateDetail.objects.bulk_create(
+        EstimateDetail(
+            estimate_header=estimate,
+            product=products[(index + line) % len(products)],
+            overall_length=Decimal("72.00"),
+            overall_breadth=Decimal("36.00"),
+            overall_height=Decimal("30.00"),
+            component_name=f"Component {line}",
+            component_length=Decimal("72.00"),
+            component_breadth=Decimal("6.00"),
+            component_thickness=Decimal("2.00"),
+            component_cft=Decimal("0.50"),
+            component_cost_per_cft=Decimal("1500.00"),
+        )
+        for index, estimate in enumerate(estimates)
+        for line in range(lines_per_estimate)
+    )
+    JobCard.objects.bulk_create(
+        JobCard(
+            estimate_header=estimate,
+            job_name=f"Job {index}",
+            product=products[index % len(products)],
+            people=["Carpenter"],
+        )
+        for index, estimate in enumerate(estimates)
+    )
+    return products, customers, projects, estimates
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class ListQueryCountTests(TestCase):
+    """
+    The list endpoints run a fixed number of queries per page, however many
+    rows the page renders. A relation that is no longer prefetched or
+    selected shows up here as one extra query per row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        create_organization_data()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertListQueries(self, url, num):
+        for page in range(1, PAGES + 1):
+            with self.subTest(page=page), self.assertNumQueries(num):
+                response = self.client.get(url, {"page": page})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), api_settings.PAGE_SIZE)
+
+    def test_job_card_list(self):
+        # Validators, count, page with its estimate, project and product, measurements
+        self.assertListQueries("/api/v1/organizations/job-cards/", 4)
+
+    def test_estimate_header_list(self):
+        # Validators, count, page with its project, detail lines with their product
+        self.assertListQueries("/api/v1/organizations/estimate-headers/", 4)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        create_organization_data(rows=api_settings.PAGE_SIZE + 5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages(self):
+        response = self.client.get("/api/v1/organizations/customers/", {"pagination": "cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), api_settings.PAGE_SIZE)
+        self.assertIsNone(response.data["previous"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        for resource in ("customers", "projects", "estimate-headers", "job-cards"):
+            for cursor in ("garbage", "bnwyMDI0fG5vdC1hLXV1aWQ="):
+                with self.subTest(resource=resource, cursor=cursor):
+                    response = self.client.get(f"/api/v1/organizations/{resource}/", {"cursor": cursor})
+                    self.assertEqual(response.status_code, 404)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        cls.token = Token.objects.get_or_create(user=cls.user)[0]
+        create_organization_data(rows=30)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_export_csv(self):
+        response = self.client.get("/api/v1/organizations/estimate-headers/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        # Header row, then one row per estimate line
+        self.assertEqual(len(rows), 1 + 30 * 3)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        client = AsyncClient()
+        for resource, export_format, lines in (
+            ("estimate-headers", "csv", 1 + 30 * 3),
+            ("estimate-headers", "ndjson", 30),
+            ("job-cards", "csv", 1 + 30),
+            ("job-cards", "ndjson", 30),
+        ):
+            with self.subTest(resource=resource, export_format=export_format):
+                response = await client.get(
+                    f"/api/v1/organizations/{resource}/export/",
+                    {"export_format": export_format},
+                    headers={"Authorization": f"Token {self.token.key}"},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.is_async)
+                content = b"".join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(len(content.decode().splitlines()), lines)
+
+
+class EstimateDetailFieldsTests(TestCase):
+    """
+    The estimate detail returns its lines by default, like the list;
+    ?fields= narrows it and ?include=details keeps the lines.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        *_, estimates = create_organization_data(rows=1)
+        cls.estimate = estimates[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        response = self.client.get(
+            f"/api/v1/organizations/estimate-headers/{self.estimate.pk}/", params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_details_by_default(self):
+        data = self.get()
+        self.assertEqual(len(data["details"]), 3)
+        self.assertEqual(data["project_name"], self.estimate.project.name)
+
+    def test_fields(self):
+        self.assertEqual(set(self.get(fields="id,status")), {"id", "status"})
+
+    def test_fields_with_details(self):
+        for params in ({"fields": "id,details"}, {"fields": "id", "include": "details"}):
+            with self.subTest(**params):
+                data = self.get(**params)
+                self.assertEqual(set(data), {"id", "details"})
+                self.assertEqual(len(data["details"]), 3)
+
+
+class EstimateCostingTests(TestCase):
+    """
+    Estimates are priced on the server: lines against hand-computed totals,
+    bulk creates in a fixed number of queries, and PATCH as a diff of lines.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        cls.oak, cls.teak = Product.objects.bulk_create(
+            [Product(name="Oak"), Product(name="Teak")]
+        )
+        customer = Customer.objects.create(name="Customer", email="customer@example.com")
+        cls.project = Project.objects.create(customer=customer, name="Project")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def line(self, product, length, breadth, thickness, cost, labour="0.00", polishing="0.00"):
+        return {
+            "productId": str(product.pk),
+            "overall_length": length,
+            "overall_breadth": breadth,
+            "overall_height": thickness,
+            "component_name": "Component",
+            "component_length": length,
+            "component_breadth": breadth,
+            "component_thickness": thickness,
+            "component_cost_per_cft": cost,
+            "labor_charges": labour,
+            "polishing_charges": polishing,
+        }
+
+    def create_estimate(self, details, **charges):
+        response = self.client.post(
+            "/api/v1/organizations/estimate-headers/",
+            {"projectId": str(self.project.pk), "details": details, **charges},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return EstimateHeader.objects.get(pk=response.data["id"])
+
+    def test_line_pricing(self):
+        # 20 x 8 x 3 / 1728 = 0.2777... CFT: 416.67 of timber, priced on the
+        # exact volume, plus 250.00 labour and 75.50 polishing.
+        # 72 x 6 x 2 / 1728 = 0.5 CFT: 600.00 of timber.
+        costing = price_estimate(
+            [
+                self.line(self.oak, "20.00", "8.00", "3.00", "1500.00", "250.00", "75.50"),
+                self.line(self.teak, "72.00", "6.00", "2.00", "1200.00"),
+            ],
+            transport_handling_cost="100.00",
+            discount="25.00",
+            approximate_tax="18.00",
+        )
+        self.assertEqual(costing.component_cft, [Decimal("0.28"), Decimal("0.50")])
+        self.assertEqual(costing.timber_costs, [Decimal("416.67"), Decimal("600.00")])
+        self.assertEqual(costing.line_totals, [Decimal("742.17"), Decimal("600.00")])
+        self.assertEqual(costing.subtotal, Decimal("1342.17"))
+        self.assertEqual(costing.estimated_total, Decimal("1435.17"))
+
+    def test_create_prices_lines(self):
+        estimate = self.create_estimate(
+            [
+                self.line(self.oak, "20.00", "8.00", "3.00", "1500.00", "250.00", "75.50"),
+                self.line(self.teak, "72.00", "6.00", "2.00", "1200.00"),
+            ],
+            transport_handling_cost="100.00",
+            discount="25.00",
+            approximate_tax="18.00",
+        )
+        self.assertEqual(estimate.estimated_total, Decimal("1435.17"))
+        self.assertEqual(
+            sorted(estimate.estimate_details.values_list("component_cft", flat=True)),
+            [Decimal("0.28"), Decimal("0.50")],
+        )
+
+    def test_create_query_count_does_not_grow_with_lines(self):
+        counts = []
+        for lines in (5, 50):
+            details = [
+                self.line((self.oak, self.teak)[index % 2], "24.00", "4.00", "2.00", "1500.00")
+                for index in range(lines)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                estimate = self.create_estimate(details)
+            self.assertEqual(estimate.estimate_details.count(), lines)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_patch_applies_a_diff_of_lines(self):
+        estimate = self.create_estimate(
+            [
+                self.line(self.oak, "20.00", "8.00", "3.00", "1500.00"),
+                self.line(self.oak, "72.00", "6.00", "2.00", "1500.00"),
+                self.line(self.teak, "36.00", "4.00", "2.00", "1200.00"),
+            ]
+        )
+        kept, changed, dropped = estimate.estimate_details.order_by("component_length")
+
+        response = self.client.patch(
+            f"/api/v1/organizations/estimate-headers/{estimate.pk}/",
+            {
+                "discount": "10.00",
+                "details": [
+                    {"id": str(kept.pk)},
+                    {"id": str(changed.pk), "component_cost_per_cft": "1800.00"},
+                    self.line(self.teak, "12.00", "12.00", "12.00", "1000.00"),
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        details = {detail.pk: detail for detail in estimate.estimate_details.all()}
+        self.assertEqual(len(details), 3)
+        self.assertIn(kept.pk, details)
+        self.assertIn(changed.pk, details)
+        self.assertNotIn(dropped.pk, details)
+        self.assertEqual(details[kept.pk].updated_at, kept.updated_at)
+        self.assertEqual(details[changed.pk].component_cost_per_cft, Decimal("1800.00"))
+        # 20 x 8 x 3 at 1500: 416.67, 36 x 4 x 2 at 1800: 300.00, one CFT at
+        # 1000: 1000.00, less the discount
+        estimate.refresh_from_db()
+        self.assertEqual(estimate.discount, Decimal("10.00"))
+        self.assertEqual(estimate.estimated_total, Decimal("1706.67"))
+        self.assertEqual(estimate.estimated_total, price_stored_estimate(estimate).estimated_total)
+
+
+class RepricingTests(TestCase):
+    """
+    The SQL re-pricing computes the same totals as the costing engine,
+    including CFT that is not a whole number.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.oak, cls.teak = Product.objects.bulk_create(
+            [Product(name="Oak"), Product(name="Teak")]
+        )
+        customer = Customer.objects.create(name="Customer", email="customer@example.com")
+        project = Project.objects.create(customer=customer, name="Project")
+        # (length, breadth, thickness, cost per CFT, labour, polishing, product)
+        lines = [
+            ("20.00", "8.00", "3.00", "1500.00", "0.00", "0.00", cls.oak),
+            ("72.00", "6.00", "2.00", "1500.00", "250.00", "75.50", cls.oak),
+            ("13.50", "7.25", "1.75", "1200.00", "0.00", "0.00", cls.teak),
+        ]
+        cls.estimates = []
+        for status, discount in (("draft", "0.00"), ("sent", "25.00"), ("approved", "0.00")):
+            estimate = EstimateHeader.objects.create(
+                project=project,
+                status=status,
+                transport_handling_cost=Decimal("100.00"),
+                discount=Decimal(discount),
+                approximate_tax=Decimal("18.00"),
+            )
+            EstimateDetail.objects.bulk_create(
+                EstimateDetail(
+                    estimate_header=estimate,
+                    product=product,
+                    overall_length=Decimal(length),
+                    overall_breadth=Decimal(breadth),
+                    overall_height=Decimal(thickness),
+                    component_name="Component",
+                    component_length=Decimal(length),
+                    component_breadth=Decimal(breadth),
+                    component_thickness=Decimal(thickness),
+                    component_cft=Decimal(0),
+                    component_cost_per_cft=Decimal(cost),
+                    labor_charges=Decimal(labour),
+                    polishing_charges=Decimal(polishing),
+                )
+                for length, breadth, thickness, cost, labour, polishing, product in lines
+            )
+            estimate.estimated_total = price_stored_estimate(estimate).estimated_total
+            estimate.save()
+            cls.estimates.append(estimate)
+
+    def expected_total(self, estimate, rate, product=None):
+        details = [
+            {
+                **vars(detail),
+                "component_cost_per_cft": (
+                    rate if product is None or detail.product_id == product.pk
+                    else detail.component_cost_per_cft
+                ),
+            }
+            for detail in estimate.estimate_details.all()
+        ]
+        return price_estimate(
+            details,
+            transport_handling_cost=estimate.transport_handling_cost,
+            discount=estimate.discount,
+            approximate_tax=estimate.approximate_tax,
+        ).estimated_total
+
+    def test_projected_total_matches_costing_engine(self):
+        for rate in (Decimal("1536.00"), Decimal("1499.99"), Decimal("0.00")):
+            for product in (None, self.oak):
+                line_filter = get_line_filter(product_id=product.pk if product else None)
+                projected = dict(
+                    EstimateHeader.objects.annotate(
+                        projected_total=projected_total(rate, line_filter)
+                    ).values_list("pk", "projected_total")
+                )
+                for estimate in self.estimates:
+                    with self.subTest(rate=rate, product=product, status=estimate.status):
+                        self.assertEqual(
+                            projected[estimate.pk], self.expected_total(estimate, rate, product)
+                        )
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command(
+            "reprice_estimates", "--rate", "1536", "--product", str(self.oak.pk), "--dry-run", stdout=out
+        )
+        draft, sent, approved = self.estimates
+        new_total = sum(
+            self.expected_total(estimate, Decimal("1536"), self.oak) for estimate in (draft, sent)
+        )
+        self.assertIn("Detail lines: 4", out.getvalue())
+        self.assertIn(f"New total: {new_total}\n", out.getvalue())
+        for estimate in self.estimates:
+            stored = EstimateHeader.objects.get(pk=estimate.pk)
+            self.assertEqual(stored.estimated_total, estimate.estimated_total)
+
+    def test_reprice_open_estimates(self):
+        rate = Decimal("1536.00")
+        draft, sent, approved = self.estimates
+        expected = {
+            draft.pk: self.expected_total(draft, rate, self.oak),
+            sent.pk: self.expected_total(sent, rate, self.oak),
+            approved.pk: approved.estimated_total,
+        }
+        call_command("reprice_estimates", "--rate", str(rate), "--product", str(self.oak.pk), stdout=StringIO())
+
+        for estimate in EstimateHeader.objects.all():
+            with self.subTest(status=estimate.status):
+                self.assertEqual(estimate.estimated_total, expected[estimate.pk])
+                # The stored total agrees with pricing the stored lines afresh
+                self.assertEqual(estimate.estimated_total, price_stored_estimate(estimate).estimated_total)
+        self.assertEqual(
+            EstimateDetail.objects.filter(product=self.oak, component_cost_per_cft=rate).count(), 4
+        )
+        self.assertFalse(
+            EstimateDetail.objects.filter(product=self.teak, component_cost_per_cft=rate).exists()
+        )
+
+    def test_requires_a_line_filter(self):
+        with self.assertRaises(CommandError):
+            call_command("reprice_estimates", "--rate", "1536", stdout=StringIO())
+
+
+class DeletionRecordTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="estimator@example.com", username="estimator", password="password"
+        )
+        cls.products, cls.customers, cls.projects, cls.estimates = create_organization_data(rows=2)
+        # A customer with several projects, estimates and job cards
+        cls.customer = cls.customers[0]
+        for project in cls.projects[1:]:
+            project.customer = cls.customer
+            project.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cascading_delete_writes_tombstones_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f"/api/v1/organizations/customers/{self.customer.pk}/")
+        self.assertEqual(response.status_code, 204)
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "deleted_records"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(DeletedRecord.objects.values_list("model_name", flat=True)),
+            ["customer"] + ["estimateheader"] * 2 + ["jobcard"] * 2 + ["project"] * 2,
+        )
+
+    def test_delete_outside_a_view_still_writes_a_tombstone(self):
+        product_id = self.products[0].pk
+        self.products[0].delete()
+        self.assertTrue(
+            DeletedRecord.objects.filter(model_name="product", object_id=product_id).exists()
+        )
@@ -34,6 +34,16 @@ urlpatterns = [
         name="project_detail",
     ),
     path("estimate-headers/", views.EstimateHeaderListCreateView.as_view(), name="estimate_header_list_create"),
+    path(
+        "estimate-headers/export/",
+        views.estimate_header_export,
+        name="estimate_header_export",
+    ),
+    path(
+        "estimate-headers/preview/",
+        views.estimate_header_preview,
+        name="estimate_header_preview",
+    ),
     path(
         "estimate-headers/<uuid:pk>/",
         views.EstimateHeaderRetrieveUpdateDestroyView.as_view(),
@@ -46,6 +56,7 @@ urlpatterns = [
         name="product_detail",
     ),
     path("job-cards/", views.JobCardListCreateView.as_view(), name="job_card_list_create"),
+    path("job-cards/export/", views.job_card_export, name="job_card_export"),
     path(
         "job-cards/<uuid:pk>/",
         views.JobCardRetrieveUpdateDestroyView.as_view(),
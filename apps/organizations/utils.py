@@ -0,0 +1,25 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+
+def report_query_count(view_method):
+    """
+    Decorator for view methods that adds an X-Query-Count header with the
+    number of database queries the method ran. Only active when DEBUG is on.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.DEBUG:
+            return view_method(self, request, *args, **kwargs)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = view_method(self, request, *args, **kwargs)
+        response[QUERY_COUNT_HEADER] = str(len(queries))
+        return response
+    return wrapper
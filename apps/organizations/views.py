@@ -1,16 +1,34 @@
 from rest_framework import status, permissions, generics
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from datetime import datetime, time, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
 from .models import Organization, Subscription, OrganizationMember, Customer, Project, EstimateHeader, Product, EstimateDetail, JobCard
 from .exceptions import log_view_errors
+from .utils import report_query_count
+from .caching import cache_catalog_response
+from .conditional import ConditionalGetViewMixin
+from .sync import SYNC_CURSOR_QUERY_PARAM, UPDATED_SINCE_QUERY_PARAM, BatchedDeletionViewMixin, DeltaSyncViewMixin
+from apps.core.querybudget import query_budget
+from apps.core.replicas import use_read_replica
+from .pagination import OptionalKeysetPagination
+from .fieldsets import FIELDS_QUERY_PARAM, INCLUDE_QUERY_PARAM, SparseFieldsViewMixin
+from .exports import EXPORT_FORMATS, EXPORTERS, iter_async
+from .costing import price_estimate
 from .serializers import (
     OrganizationSerializer,
     SubscriptionSerializer,
@@ -24,12 +42,21 @@ from .serializers import (
     EstimateHeaderWithDetailsReadSerializer,
     EstimateHeaderUpdateSerializer,
     EstimateHeaderWithDetailsUpdateSerializer,
+    EstimatePreviewSerializer,
+    EstimateCostingSerializer,
     ProductSerializer,
     JobCardSerializer,
     JobCardPostSerializer,
 )
 
+# Estimate lines are always serialized with their product name
+ESTIMATE_DETAILS_PREFETCH = Prefetch(
+    "estimate_details", queryset=EstimateDetail.objects.select_related("product")
+)
+
 
+@use_read_replica
+@query_budget(3)
 @extend_schema(
     summary="List organizations",
     responses={200: OrganizationSerializer(many=True)},
@@ -54,6 +81,7 @@ def organization_list(request):
         )
 
 
+@query_budget(6)
 @extend_schema(
     summary="Create organization",
     request=OrganizationSerializer,
@@ -86,6 +114,7 @@ def organization_create(request):
         )
 
 
+@query_budget(3)
 @extend_schema(
     summary="Get organization details",
     responses={200: OrganizationSerializer},
@@ -100,6 +129,7 @@ def organization_detail(request, pk):
     return Response(serializer.data)
 
 
+@query_budget(4)
 @extend_schema(
     summary="Update organization",
     request=OrganizationSerializer,
@@ -133,6 +163,8 @@ def organization_update(request, pk):
         )
 
 
+@use_read_replica
+@query_budget(3)
 @extend_schema(
     summary="List subscriptions",
     responses={200: SubscriptionSerializer(many=True)},
@@ -148,6 +180,7 @@ def subscription_list(request):
     return Response(serializer.data)
 
 
+@query_budget(6)
 @extend_schema(
     summary="Create subscription",
     request=SubscriptionSerializer,
@@ -190,6 +223,8 @@ def subscription_create(request):
         )
 
 
+@use_read_replica
+@query_budget(4)
 @extend_schema(
     summary="List organization members",
     responses={200: OrganizationMemberSerializer(many=True)},
@@ -202,27 +237,61 @@ def organization_members_list(request, pk):
     )
     members = OrganizationMember.objects.filter(
         organization=organization, is_active=True
-    )
+    ).select_related("user", "organization")
     serializer = OrganizationMemberSerializer(members, many=True)
     return Response(serializer.data)
 
 
+SYNC_PARAMETERS = [
+    OpenApiParameter(
+        UPDATED_SINCE_QUERY_PARAM,
+        OpenApiTypes.DATETIME,
+        description="Delta sync: only rows changed since this time (a previous sync_token), plus deleted ids",
+    ),
+    OpenApiParameter(SYNC_CURSOR_QUERY_PARAM, str, description="Cursor from the next link of a delta sync page"),
+]
+
+SPARSE_PARAMETERS = [
+    OpenApiParameter(
+        FIELDS_QUERY_PARAM,
+        str,
+        description="Comma-separated fields to return; the others are neither serialized nor selected",
+    ),
+]
+
+ESTIMATE_SPARSE_PARAMETERS = SPARSE_PARAMETERS + [
+    OpenApiParameter(
+        INCLUDE_QUERY_PARAM,
+        str,
+        enum=["details"],
+        description="Return the estimate lines along with the fields named in fields",
+    ),
+]
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class CustomerListCreateView(generics.ListCreateAPIView):
+class CustomerListCreateView(SparseFieldsViewMixin, DeltaSyncViewMixin, ConditionalGetViewMixin, generics.ListCreateAPIView):
     """
     List all customers or create a new customer.
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
+    read_replica = True
+    pagination_class = OptionalKeysetPagination
 
     @extend_schema(
         summary="List customers",
         responses={200: CustomerSerializer(many=True)},
+        parameters=SYNC_PARAMETERS + SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
             return super().get(request, *args, **kwargs)
+        except APIException:
+            # e.g. a malformed pagination cursor: a client error, not a 500
+            raise
         except Exception as e:
             logger.error(f"Error in CustomerListCreateView.get: {str(e)}", exc_info=True)
             return Response(
@@ -253,17 +322,20 @@ class CustomerListCreateView(generics.ListCreateAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class CustomerRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class CustomerRetrieveUpdateDestroyView(SparseFieldsViewMixin, ConditionalGetViewMixin, BatchedDeletionViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a customer instance.
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # A delete cascades: one query per related model, not per row
+    query_budget = 14
 
     @extend_schema(
         summary="Get customer details",
         responses={200: CustomerSerializer},
+        parameters=SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
@@ -333,21 +405,28 @@ class CustomerRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ProjectListCreateView(generics.ListCreateAPIView):
+class ProjectListCreateView(SparseFieldsViewMixin, DeltaSyncViewMixin, ConditionalGetViewMixin, generics.ListCreateAPIView):
     """
     List all projects or create a new project.
     """
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
+    read_replica = True
+    pagination_class = OptionalKeysetPagination
 
     @extend_schema(
         summary="List projects",
         responses={200: ProjectSerializer(many=True)},
+        parameters=SYNC_PARAMETERS + SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
             return super().get(request, *args, **kwargs)
+        except APIException:
+            # e.g. a malformed pagination cursor: a client error, not a 500
+            raise
         except Exception as e:
             logger.error(f"Error in ProjectListCreateView.get: {str(e)}", exc_info=True)
             return Response(
@@ -381,22 +460,23 @@ class ProjectListCreateView(generics.ListCreateAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ProjectRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ProjectRetrieveUpdateDestroyView(SparseFieldsViewMixin, ConditionalGetViewMixin, BatchedDeletionViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a project instance.
     """
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 12
 
     @extend_schema(
         summary="Get project details",
         responses={200: ProjectSerializer},
+        parameters=SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
-            serializer = ProjectSerializer(self.get_object())
-            return Response(serializer.data)
+            return super().get(request, *args, **kwargs)
         except Exception as e:
             logger.error(f"Error in ProjectRetrieveUpdateDestroyView.get: {str(e)}", exc_info=True)
             return Response(
@@ -464,22 +544,31 @@ class ProjectRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class EstimateHeaderListCreateView(generics.ListCreateAPIView):
+class EstimateHeaderListCreateView(SparseFieldsViewMixin, DeltaSyncViewMixin, ConditionalGetViewMixin, generics.ListCreateAPIView):
     """
     List all estimate headers or create a new estimate header.
     """
-    queryset = EstimateHeader.objects.select_related('project').prefetch_related('estimate_details')
+    queryset = EstimateHeader.objects.all()
     serializer_class = EstimateHeaderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 12
+    read_replica = True
+    validator_models = (EstimateHeader, Project, EstimateDetail, Product)
+    sparse_prefetches = {"details": ESTIMATE_DETAILS_PREFETCH}
+    pagination_class = OptionalKeysetPagination
 
     @extend_schema(
         summary="List estimate headers",
         responses={200: EstimateHeaderWithDetailsReadSerializer(many=True)},
+        parameters=SYNC_PARAMETERS + ESTIMATE_SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
             self.serializer_class = EstimateHeaderWithDetailsReadSerializer
             return super().get(request, *args, **kwargs)
+        except APIException:
+            # e.g. a malformed pagination cursor: a client error, not a 500
+            raise
         except Exception as e:
             logger.error(f"Error in EstimateHeaderListCreateView.get: {str(e)}", exc_info=True)
             return Response(
@@ -495,6 +584,7 @@ class EstimateHeaderListCreateView(generics.ListCreateAPIView):
         request=EstimateHeaderWithDetailsSerializer,
         responses={201: EstimateHeaderWithDetailsSerializer},
     )
+    @report_query_count
     def post(self, request, *args, **kwargs):
         try:
             # Check if request contains details data
@@ -519,23 +609,113 @@ class EstimateHeaderListCreateView(generics.ListCreateAPIView):
             )
 
 
+EXPORT_PARAMETERS = [
+    OpenApiParameter("export_format", str, enum=list(EXPORT_FORMATS), description="csv (default) or ndjson"),
+    OpenApiParameter("created_after", OpenApiTypes.DATE, description="Only rows created on or after this date"),
+    OpenApiParameter("created_before", OpenApiTypes.DATE, description="Only rows created on or before this date"),
+    OpenApiParameter("status", str, description="Only rows with this status"),
+]
+
+
+def export_response(request, queryset, basename):
+    """
+    Stream queryset as a CSV or NDJSON download, filtered by the
+    created_after, created_before and status query parameters.
+    """
+    export_format = request.query_params.get("export_format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {"error": f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    for param, lookup, offset in (
+        ("created_after", "created_at__gte", timedelta(0)),
+        ("created_before", "created_at__lt", timedelta(days=1)),
+    ):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        day = parse_date(value)
+        if day is None:
+            return Response(
+                {"error": f"{param} must be a date in YYYY-MM-DD format"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start = timezone.make_aware(datetime.combine(day, time.min)) + offset
+        queryset = queryset.filter(**{lookup: start})
+    if request.query_params.get("status"):
+        queryset = queryset.filter(status=request.query_params["status"])
+
+    # Rows are read after the view returns, so fix the database now
+    queryset = queryset.using(queryset.db)
+    content = EXPORTERS[queryset.model][export_format](queryset)
+    if isinstance(request._request, ASGIRequest):
+        content = iter_async(content)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{basename}.{export_format}"'
+    return response
+
+
+@use_read_replica
+@query_budget(2)
+@extend_schema(
+    summary="Export estimates",
+    description="Streams every matching estimate with its detail lines as CSV (one row per line) or NDJSON (one estimate per line)",
+    parameters=EXPORT_PARAMETERS,
+    responses={(200, "text/csv"): OpenApiTypes.STR, (200, "application/x-ndjson"): OpenApiTypes.STR},
+)
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def estimate_header_export(request):
+    return export_response(request, EstimateHeader.objects.all(), "estimates")
+
+
+@query_budget(2)
+@extend_schema(
+    summary="Preview estimate pricing",
+    description="Prices an estimate with the server-side costing engine without saving it",
+    request=EstimatePreviewSerializer,
+    responses={200: EstimateCostingSerializer},
+)
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def estimate_header_preview(request):
+    serializer = EstimatePreviewSerializer(data=request.data)
+    if serializer.is_valid():
+        details = serializer.validated_data.pop("details")
+        costing = price_estimate(details, **serializer.validated_data)
+        return Response(EstimateCostingSerializer(costing).data)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class EstimateHeaderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class EstimateHeaderRetrieveUpdateDestroyView(SparseFieldsViewMixin, ConditionalGetViewMixin, BatchedDeletionViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an estimate header instance.
     """
     queryset = EstimateHeader.objects.all()
     serializer_class = EstimateHeaderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 15
+    validator_models = (EstimateHeader, Project, EstimateDetail, Product)
+    sparse_prefetches = {"details": ESTIMATE_DETAILS_PREFETCH}
+
+    def get_serializer_class(self):
+        # Like the list, GET returns the estimate with its lines; ?fields=
+        # narrows it and ?include=details keeps the lines
+        if self.request.method == 'GET':
+            return EstimateHeaderWithDetailsReadSerializer
+        return super().get_serializer_class()
 
     @extend_schema(
         summary="Get estimate header details",
-        responses={200: EstimateHeaderSerializer},
+        responses={200: EstimateHeaderWithDetailsReadSerializer},
+        parameters=ESTIMATE_SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
-            serializer = EstimateHeaderSerializer(self.get_object())
-            return Response(serializer.data)
+            return super().get(request, *args, **kwargs)
         except Exception as e:
             logger.error(f"Error in EstimateHeaderRetrieveUpdateDestroyView.get: {str(e)}", exc_info=True)
             return Response(
@@ -570,6 +750,7 @@ class EstimateHeaderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIV
         request=EstimateHeaderUpdateSerializer,
         responses={200: EstimateHeaderWithDetailsReadSerializer},
     )
+    @report_query_count
     def patch(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -584,6 +765,9 @@ class EstimateHeaderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIV
             if serializer.is_valid():
                 updated_instance = serializer.save()
                 # Return the updated instance with details using the read serializer
+                updated_instance = EstimateHeader.objects.select_related('project').prefetch_related(
+                    ESTIMATE_DETAILS_PREFETCH
+                ).get(pk=updated_instance.pk)
                 response_serializer = EstimateHeaderWithDetailsReadSerializer(updated_instance)
                 return Response(response_serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -616,18 +800,22 @@ class EstimateHeaderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIV
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(SparseFieldsViewMixin, DeltaSyncViewMixin, ConditionalGetViewMixin, generics.ListCreateAPIView):
     """
     List all products or create a new product.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
+    read_replica = True
 
     @extend_schema(
         summary="List products",
         responses={200: ProductSerializer(many=True)},
+        parameters=SYNC_PARAMETERS + SPARSE_PARAMETERS,
     )
+    @cache_catalog_response
     def get(self, request, *args, **kwargs):
         try:
             return super().get(request, *args, **kwargs)
@@ -661,18 +849,21 @@ class ProductListCreateView(generics.ListCreateAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ProductRetrieveUpdateDestroyView(SparseFieldsViewMixin, ConditionalGetViewMixin, BatchedDeletionViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a product instance.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 10
 
     @extend_schema(
         summary="Get product details",
         responses={200: ProductSerializer},
+        parameters=SPARSE_PARAMETERS,
     )
+    @cache_catalog_response
     def get(self, request, *args, **kwargs):
         try:
             return super().get(request, *args, **kwargs)
@@ -740,13 +931,32 @@ class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
             )
 
 
+@use_read_replica
+@query_budget(2)
+@extend_schema(
+    summary="Export job cards",
+    description="Streams every matching job card as CSV or NDJSON",
+    parameters=EXPORT_PARAMETERS,
+    responses={(200, "text/csv"): OpenApiTypes.STR, (200, "application/x-ndjson"): OpenApiTypes.STR},
+)
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def job_card_export(request):
+    return export_response(request, JobCard.objects.all(), "job_cards")
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class JobCardListCreateView(generics.ListCreateAPIView):
+class JobCardListCreateView(SparseFieldsViewMixin, DeltaSyncViewMixin, ConditionalGetViewMixin, generics.ListCreateAPIView):
     """
     List all job cards or create a new job card.
     """
     queryset = JobCard.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 8
+    read_replica = True
+    validator_models = (JobCard, EstimateHeader, Project, EstimateDetail, Product)
+    sparse_method_sources = {"measurements": ("estimate_header", "product")}
+    pagination_class = OptionalKeysetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -756,10 +966,14 @@ class JobCardListCreateView(generics.ListCreateAPIView):
     @extend_schema(
         summary="List job cards",
         responses={200: JobCardSerializer(many=True)},
+        parameters=SYNC_PARAMETERS + SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
             return super().get(request, *args, **kwargs)
+        except APIException:
+            # e.g. a malformed pagination cursor: a client error, not a 500
+            raise
         except Exception as e:
             logger.error(f"Error in JobCardListCreateView.get: {str(e)}", exc_info=True)
             return Response(
@@ -790,13 +1004,16 @@ class JobCardListCreateView(generics.ListCreateAPIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class JobCardRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class JobCardRetrieveUpdateDestroyView(SparseFieldsViewMixin, ConditionalGetViewMixin, BatchedDeletionViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a job card instance.
     """
     queryset = JobCard.objects.all()
     serializer_class = JobCardSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 8
+    validator_models = (JobCard, EstimateHeader, Project, EstimateDetail, Product)
+    sparse_method_sources = {"measurements": ("estimate_header", "product")}
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -806,6 +1023,7 @@ class JobCardRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     @extend_schema(
         summary="Get job card details",
         responses={200: JobCardSerializer},
+        parameters=SPARSE_PARAMETERS,
     )
     def get(self, request, *args, **kwargs):
         try:
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LocalTTLCache:
+    """
+    Small thread-safe LRU cache with a per-entry time to live, kept in the
+    memory of a single worker process.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LocalTTLCache(
+    max_size=getattr(settings, "TOKEN_CACHE_LOCAL_SIZE", 1024),
+    ttl=getattr(settings, "TOKEN_CACHE_LOCAL_TTL", 10),
+)
+
+
+def get_token_cache():
+    return caches[getattr(settings, "TOKEN_CACHE_ALIAS", "default")]
+
+
+def get_cache_key(key):
+    # Never use the raw token as a cache key
+    return "auth:token:v2:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """Drop a token from the shared cache and from this process's LRU."""
+    local_token_cache.delete(key)
+    get_token_cache().delete(get_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches the token and its user.
+
+    Lookups go to an in-process LRU first, then to the shared cache, and
+    only hit the database on a miss. Tokens are invalidated when deleted or
+    when their user is saved (see apps.users.signals); other worker
+    processes may keep a token in their LRU for up to TOKEN_CACHE_LOCAL_TTL
+    seconds after that. The caches hold plain values, never the password
+    hash or the one-time tokens, and every request gets its own instances.
+    """
+
+    def authenticate_credentials(self, key):
+        data = local_token_cache.get(key)
+        if data is None:
+            cache = get_token_cache()
+            cache_key = get_cache_key(key)
+            data = cache.get(cache_key)
+            if data is None:
+                # Raises AuthenticationFailed for unknown keys and inactive users
+                user, token = super().authenticate_credentials(key)
+                data = serialize_token(token)
+                cache.set(cache_key, data, getattr(settings, "TOKEN_CACHE_TTL", 300))
+            local_token_cache.set(key, data)
+        token = build_token(data)
+        return token.user, token
+
+
+# User columns kept out of the caches; they load from the database if read
+UNCACHED_USER_FIELDS = ("password", "email_verification_token", "password_reset_token")
+
+
+def serialize_token(token):
+    """The cached values of a token and its user."""
+    user = token.user
+    return {
+        "db": user._state.db,
+        "key": token.key,
+        "created": token.created,
+        "user": {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname not in UNCACHED_USER_FIELDS
+        },
+    }
+
+
+def build_token(data):
+    """
+    Token and user instances from serialize_token() values, as if loaded
+    from the database with the uncached user columns deferred.
+    """
+    user_model = Token._meta.get_field("user").related_model
+    values = data["user"]
+    user = user_model.from_db(
+        data["db"],
+        list(values),
+        [values[field.attname] for field in user_model._meta.concrete_fields if field.attname in values],
+    )
+    token = Token.from_db(
+        data["db"], ["key", "user_id", "created"], [data["key"], user.pk, data["created"]]
+    )
+    token.user = user
+    return token
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("email_verification_token__isnull", False)),
+                fields=["email_verification_token"],
+                name="users_email_verify_token_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("password_reset_token__isnull", False)),
+                fields=["password_reset_token"],
+                name="users_password_reset_token_idx",
+            ),
+        ),
+    ]
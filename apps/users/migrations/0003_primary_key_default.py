@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:31
+
+import apps.core.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_token_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=apps.core.uuids.new_primary_key, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -3,9 +3,11 @@ from django.db import models
 from django.utils import timezone
 import uuid
 
+from apps.core.uuids import new_primary_key
+
 
 class User(AbstractUser):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=new_primary_key, editable=False)
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     is_email_verified = models.BooleanField(default=False)
@@ -22,6 +24,20 @@ class User(AbstractUser):
         db_table = "users"
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            # Email verification and password reset look users up by token;
+            # only the few users with an outstanding token are indexed
+            models.Index(
+                fields=["email_verification_token"],
+                name="users_email_verify_token_idx",
+                condition=models.Q(email_verification_token__isnull=False),
+            ),
+            models.Index(
+                fields=["password_reset_token"],
+                name="users_password_reset_token_idx",
+                condition=models.Q(password_reset_token__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.email
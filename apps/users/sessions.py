@@ -0,0 +1,40 @@
+"""
+Sessions only where they are used.
+
+Mobile and other API clients authenticate with a token on every request,
+so loading (and, with SESSION_SAVE_EVERY_REQUEST, saving) a session for
+them is wasted work. APISessionMiddleware gives such requests an empty
+session that is never read or stored:
+
+- AUTH_PROFILE=mixed: requests sending an `Authorization: Token ...`
+  header skip the session; browsers keep session authentication.
+- AUTH_PROFILE=token: only SESSION_URL_PREFIXES (the admin) use sessions;
+  the API authenticates with tokens alone.
+"""
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+TOKEN_KEYWORD = "Token "
+
+
+def request_uses_session(request):
+    if settings.TOKEN_AUTH_PROFILE:
+        return request.path_info.startswith(tuple(settings.SESSION_URL_PREFIXES))
+    return not request.headers.get("Authorization", "").startswith(TOKEN_KEYWORD)
+
+
+class APISessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that skips requests which do not use a session."""
+
+    def process_request(self, request):
+        request.uses_session = request_uses_session(request)
+        if request.uses_session:
+            super().process_request(request)
+        else:
+            # No session key: reading it returns nothing without a query
+            request.session = self.SessionStore()
+
+    def process_response(self, request, response):
+        if not getattr(request, "uses_session", True):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,140 @@
+import json
+import logging
+import random
+from functools import lru_cache
+from smtplib import SMTPException
+
+import redis
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+logger = logging.getLogger(__name__)
+
+# Redis list emails wait on until drain_email_queue sends them in batches
+EMAIL_QUEUE_KEY = "emails:queued"
+# Held by the running drain_email_queue, expiring in case its worker dies
+EMAIL_DRAIN_LOCK_KEY = "emails:draining"
+EMAIL_DRAIN_LOCK_TIMEOUT = 60
+
+
+@lru_cache(maxsize=None)
+def get_email_queue():
+    """
+    Redis client holding the shared email queue, or None when emails go
+    straight to send_emails (no Redis, or tasks running in-process).
+    """
+    if not settings.REDIS_URL or settings.CELERY_TASK_ALWAYS_EAGER:
+        return None
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email["subject"],
+        body=email["message"],
+        from_email=email["from_email"],
+        to=email["recipient_list"],
+        connection=connection,
+    )
+    if email.get("html_message"):
+        message.attach_alternative(email["html_message"], "text/html")
+    return message
+
+
+def print_undelivered(email):
+    print(f"\n{'='*50}")
+    print("EMAIL FALLBACK - Could not send via SMTP")
+    print(f"{'='*50}")
+    print(f"To: {', '.join(email['recipient_list'])}")
+    print(f"Subject: {email['subject']}")
+    print(f"Message: {email['message']}")
+    if email.get("html_message"):
+        print(f"HTML: {email['html_message']}")
+    print(f"{'='*50}\n")
+
+
+def get_retry_delay(retries):
+    """Exponential backoff with full jitter, in seconds."""
+    ceiling = min(
+        settings.EMAIL_RETRY_BACKOFF * 2**retries, settings.EMAIL_RETRY_BACKOFF_MAX
+    )
+    return random.uniform(0, ceiling)
+
+
+@shared_task(bind=True, ignore_result=True)
+def send_emails(self, emails):
+    """
+    Deliver a batch of queued emails over a single SMTP connection.
+
+    Only the messages that failed are retried, so a retry never resends
+    mail that was already delivered.
+    """
+    pending = list(emails)
+    failed = []
+    try:
+        with get_connection() as connection:
+            while pending:
+                email = pending.pop(0)
+                try:
+                    build_message(email, connection).send()
+                except (SMTPException, OSError) as e:
+                    logger.warning(
+                        f"Failed to send email to {email['recipient_list']}: {str(e)}"
+                    )
+                    failed.append(email)
+    except (SMTPException, OSError) as e:
+        logger.warning(f"Email connection failed: {str(e)}")
+    # Messages not attempted because the connection could not be opened
+    failed += pending
+
+    sent = len(emails) - len(failed)
+    if sent:
+        logger.info(f"Sent {sent} email(s)")
+    if not failed:
+        return
+
+    # Without a broker the task runs inline in the request, so do not retry
+    if not self.request.is_eager and self.request.retries < settings.EMAIL_MAX_RETRIES:
+        raise self.retry(args=[failed], countdown=get_retry_delay(self.request.retries))
+
+    for email in failed:
+        logger.error(
+            f"Giving up on email to {email['recipient_list']} "
+            f"after {self.request.retries} retries"
+        )
+        # Fallback to console output for development
+        if settings.DEBUG:
+            print_undelivered(email)
+
+
+@shared_task(ignore_result=True)
+def drain_email_queue():
+    """
+    Hand the emails queued since the last run to send_emails, in batches of
+    EMAIL_BATCH_SIZE, so a batch shares one SMTP connection however many
+    requests queued it. Scheduled every EMAIL_BATCH_INTERVAL seconds.
+
+    A batch is only removed from the list once send_emails has been
+    published, so a broker outage leaves it queued for the next run rather
+    than losing it. Delivery is therefore at least once: a drain that dies
+    between publishing and trimming sends that batch again.
+    """
+    queue = get_email_queue()
+    if queue is None:
+        return
+    # One drain at a time, so the head of the list is only read by this one
+    lock = queue.lock(EMAIL_DRAIN_LOCK_KEY, timeout=EMAIL_DRAIN_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        return
+    try:
+        while True:
+            batch = queue.lrange(EMAIL_QUEUE_KEY, 0, settings.EMAIL_BATCH_SIZE - 1)
+            if not batch:
+                return
+            send_emails.delay([json.loads(email) for email in batch])
+            # Requests only append, so the batch is still the head of the list
+            queue.ltrim(EMAIL_QUEUE_KEY, len(batch), -1)
+            lock.extend(EMAIL_DRAIN_LOCK_TIMEOUT, replace_ttl=True)
+    finally:
+        lock.release()
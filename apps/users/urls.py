@@ -2,7 +2,7 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path("register/", views.register, name="register"),
+    path("register/", views.RegisterView.as_view(), name="register"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
     path("profile/", views.profile, name="profile"),
@@ -12,7 +12,7 @@ urlpatterns = [
     ),
     path(
         "password-reset/request/",
-        views.request_password_reset,
+        views.PasswordResetRequestView.as_view(),
         name="request_password_reset",
     ),
     path(
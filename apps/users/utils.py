@@ -1,49 +1,56 @@
+import json
 import logging
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+
+from .tasks import EMAIL_QUEUE_KEY, get_email_queue, send_emails
 
 logger = logging.getLogger(__name__)
 
 
-def send_email_with_fallback(
+def queue_email(
     subject, message, recipient_list, html_message=None, from_email=None
 ):
     """
-    Send email with fallback to console backend if SMTP fails
+    Queue an email for delivery once the current transaction commits.
+
+    With Redis the email joins a shared list that drain_email_queue sends
+    in batches; otherwise it is handed to send_emails on its own. Delivery,
+    retries and the development console fallback happen in the worker, so
+    the request never waits on SMTP.
+
+    Returns whether the email was queued, not whether it was delivered.
+    Inside a transaction it is queued on commit and True is returned.
     """
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False,
-        )
-        logger.info(f"Email sent successfully to {recipient_list}")
+    email = {
+        "subject": subject,
+        "message": message,
+        "recipient_list": list(recipient_list),
+        "html_message": html_message,
+        "from_email": from_email or settings.DEFAULT_FROM_EMAIL,
+    }
+
+    def enqueue():
+        try:
+            queue = get_email_queue()
+            if queue is None:
+                send_emails.delay([email])
+            else:
+                queue.rpush(EMAIL_QUEUE_KEY, json.dumps(email))
+        except Exception as e:
+            logger.error(f"Failed to queue email to {recipient_list}: {str(e)}")
+            return False
         return True
-    except Exception as e:
-        logger.error(f"Failed to send email to {recipient_list}: {str(e)}")
 
-        # Fallback to console backend for development
-        if settings.DEBUG:
-            print(f"\n{'='*50}")
-            print("EMAIL FALLBACK - Could not send via SMTP")
-            print(f"{'='*50}")
-            print(f"To: {', '.join(recipient_list)}")
-            print(f"Subject: {subject}")
-            print(f"Message: {message}")
-            if html_message:
-                print(f"HTML: {html_message}")
-            print(f"{'='*50}\n")
-            return True
-
-        return False
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(enqueue)
+        return True
+    return enqueue()
 
 
 def send_verification_email(user, token):
     """
-    Send email verification email
+    Send email verification email. Returns whether it was queued.
     """
     verification_url = f"{settings.FRONTEND_URL}/verify-email/{token}/"
 
@@ -92,7 +99,7 @@ def send_verification_email(user, token):
     This link will expire in 24 hours. If you didn't create an account with Timber, please ignore this email.
     """
 
-    return send_email_with_fallback(
+    return queue_email(
         subject=subject,
         message=message,
         recipient_list=[user.email],
@@ -102,7 +109,7 @@ def send_verification_email(user, token):
 
 def send_password_reset_email(user, token):
     """
-    Send password reset email
+    Send password reset email. Returns whether it was queued.
     """
     reset_url = f"{settings.FRONTEND_URL}/reset-password/{token}/"
 
@@ -154,7 +161,7 @@ def send_password_reset_email(user, token):
     please ignore this email or contact support if you have concerns.
     """
 
-    return send_email_with_fallback(
+    return queue_email(
         subject=subject,
         message=message,
         recipient_list=[user.email],
@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -6,7 +7,11 @@ from django.contrib.auth import login, logout
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
+from apps.core.async_views import AsyncAPIView
+from apps.core.querybudget import query_budget
+
 from .models import User
+from .sessions import request_uses_session
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -18,44 +23,60 @@ from .serializers import (
 from .utils import send_verification_email, send_password_reset_email
 
 
-@extend_schema(
-    summary="Register a new user",
-    request=UserRegistrationSerializer,
-    responses={201: UserProfileSerializer},
-)
-@api_view(["POST"])
-@permission_classes([permissions.AllowAny])
-def register(request):
-    serializer = UserRegistrationSerializer(data=request.data)
-    if serializer.is_valid():
-        user = serializer.save()
+def create_registered_user(serializer):
+    """
+    Save a validated registration and return the user, their email
+    verification token and their auth token.
+    """
+    user = serializer.save()
 
-        # Generate email verification token
-        token = user.generate_email_verification_token()
+    # Generate email verification token
+    token = user.generate_email_verification_token()
 
-        # Send verification email
-        email_sent = send_verification_email(user, token)
+    # Create auth token
+    token_obj, created = Token.objects.get_or_create(user=user)
+    return user, token, token_obj
 
-        # Create auth token
-        token_obj, created = Token.objects.get_or_create(user=user)
 
-        response_data = {
-            "user": UserProfileSerializer(user).data,
-            "token": token_obj.key,
-            "message": "Registration successful. Please check your email for verification.",
-            "email_sent": email_sent,
-        }
+class RegisterView(AsyncAPIView):
+    """
+    Register a new user. Async so that, under ASGI, waiting on the database
+    and on the email queue does not tie up a worker.
+    """
+    permission_classes = [permissions.AllowAny]
+    query_budget = 10
 
-        if not email_sent:
-            response_data["warning"] = (
-                "Email could not be sent. Please check your email configuration."
-            )
+    @extend_schema(
+        summary="Register a new user",
+        request=UserRegistrationSerializer,
+        responses={201: UserProfileSerializer},
+    )
+    async def post(self, request):
+        serializer = UserRegistrationSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            user, token, token_obj = await sync_to_async(create_registered_user)(serializer)
 
-        return Response(response_data, status=status.HTTP_201_CREATED)
+            # Queue the verification email
+            email_sent = await sync_to_async(send_verification_email)(user, token)
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            response_data = {
+                "user": UserProfileSerializer(user).data,
+                "token": token_obj.key,
+                "message": "Registration successful. Please check your email for verification.",
+                "email_sent": email_sent,
+            }
+
+            if not email_sent:
+                response_data["warning"] = (
+                    "Email could not be sent. Please check your email configuration."
+                )
+
+            return Response(response_data, status=status.HTTP_201_CREATED)
 
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+@query_budget(4)
 @extend_schema(
     summary="Login user",
     request=UserLoginSerializer,
@@ -67,7 +88,8 @@ def login_view(request):
     serializer = UserLoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data["user"]
-        login(request, user)
+        if request_uses_session(request):
+            login(request, user)
 
         # Create or get auth token
         token, created = Token.objects.get_or_create(user=user)
@@ -83,6 +105,7 @@ def login_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(4)
 @extend_schema(
     summary="Logout user",
     responses={200: dict},
@@ -96,10 +119,12 @@ def logout_view(request):
     except BaseException:
         pass
 
-    logout(request)
+    if request_uses_session(request):
+        logout(request)
     return Response({"message": "Logout successful"})
 
 
+@query_budget(2)
 @extend_schema(
     summary="Get user profile",
     responses={200: UserProfileSerializer},
@@ -111,6 +136,7 @@ def profile(request):
     return Response(serializer.data)
 
 
+@query_budget(4)
 @extend_schema(
     summary="Update user profile",
     request=UserProfileSerializer,
@@ -128,6 +154,7 @@ def update_profile(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(6)
 @extend_schema(
     summary="Verify email address",
     parameters=[
@@ -157,40 +184,46 @@ def verify_email(request, token):
         )
 
 
-@extend_schema(
-    summary="Request password reset",
-    request=PasswordResetRequestSerializer,
-    responses={200: dict},
-)
-@api_view(["POST"])
-@permission_classes([permissions.AllowAny])
-def request_password_reset(request):
-    serializer = PasswordResetRequestSerializer(data=request.data)
-    if serializer.is_valid():
-        email = serializer.validated_data["email"]
-        user = User.objects.get(email=email)
+class PasswordResetRequestView(AsyncAPIView):
+    """
+    Send a password reset link. Async for the same reason as RegisterView.
+    """
+    permission_classes = [permissions.AllowAny]
+    query_budget = 6
 
-        # Generate password reset token
-        token = user.generate_password_reset_token()
+    @extend_schema(
+        summary="Request password reset",
+        request=PasswordResetRequestSerializer,
+        responses={200: dict},
+    )
+    async def post(self, request):
+        serializer = PasswordResetRequestSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            email = serializer.validated_data["email"]
+            user = await User.objects.aget(email=email)
 
-        # Send password reset email
-        email_sent = send_password_reset_email(user, token)
+            # Generate password reset token
+            token = await sync_to_async(user.generate_password_reset_token)()
 
-        response_data = {
-            "message": "Password reset link sent to your email",
-            "email_sent": email_sent,
-        }
+            # Queue the password reset email
+            email_sent = await sync_to_async(send_password_reset_email)(user, token)
 
-        if not email_sent:
-            response_data["warning"] = (
-                "Email could not be sent. Please check your email configuration."
-            )
+            response_data = {
+                "message": "Password reset link sent to your email",
+                "email_sent": email_sent,
+            }
 
-        return Response(response_data)
+            if not email_sent:
+                response_data["warning"] = (
+                    "Email could not be sent. Please check your email configuration."
+                )
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(response_data)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(6)
 @extend_schema(
     summary="Confirm password reset",
     request=PasswordResetConfirmSerializer,
@@ -225,6 +258,7 @@ def confirm_password_reset(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(4)
 @extend_schema(
     summary="Change password",
     request=PasswordChangeSerializer,
@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration. Loaded automatically from the working directory.
+
+SERVER_MODE=asgi serves timber_be.asgi with Uvicorn workers, so a request
+waiting on the database, the cache or the email broker no longer holds a
+whole worker; the default, wsgi, keeps the synchronous workers.
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "3"))
+
+if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "timber_be.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "timber_be.wsgi:application"
+
+
+def on_starting(server):
+    # Start every deployment with empty per-worker metric files
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
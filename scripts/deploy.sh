@@ -95,7 +95,7 @@ health_check() {
     sleep 10
     
     # Check if application is responding
-    if curl -f http://localhost:8000/api/v1/health/ > /dev/null 2>&1; then
+    if curl -f http://localhost:8000/readyz > /dev/null 2>&1; then
         echo "✅ Application is healthy"
         return 0
     else
@@ -197,7 +197,7 @@ show_status() {
     
     echo ""
     echo "🏥 Health Check:"
-    if curl -f http://localhost:8000/api/v1/health/ > /dev/null 2>&1; then
+    if curl -f http://localhost:8000/readyz > /dev/null 2>&1; then
         echo "✅ Application is healthy"
     else
         echo "❌ Application is not responding"
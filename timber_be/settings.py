@@ -34,14 +34,17 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     "apps.users",
     "apps.organizations",
+    "apps.core",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "apps.core.metrics.MetricsMiddleware",
+    "apps.core.logs.RequestContextMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "apps.users.sessions.APISessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -49,6 +52,19 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-request query budgets and N+1 detection (development and tests)
+QUERY_BUDGET_ENABLED = config("QUERY_BUDGET_ENABLED", default=DEBUG, cast=bool)
+QUERY_BUDGET_RAISE = config("QUERY_BUDGET_RAISE", default=False, cast=bool)
+QUERY_BUDGET_DEFAULT = config("QUERY_BUDGET_DEFAULT", default=30, cast=int)
+QUERY_BUDGET_REPEAT_THRESHOLD = config(
+    "QUERY_BUDGET_REPEAT_THRESHOLD", default=5, cast=int
+)
+# Budgets by URL name, overriding the ones declared on views
+QUERY_BUDGETS = {}
+
+if QUERY_BUDGET_ENABLED:
+    MIDDLEWARE.append("apps.core.querybudget.QueryBudgetMiddleware")
+
 ROOT_URLCONF = "timber_be.urls"
 
 TEMPLATES = [
@@ -105,6 +121,62 @@ else:
         }
     }
 
+# Read replicas: comma-separated hosts (file names for SQLite), each a copy
+# of the default database with that host. See apps.core.replicas.
+DB_REPLICAS = config(
+    "DB_REPLICAS", default="", cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+DATABASE_REPLICAS = []
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    alias = f"replica_{index}"
+    location = "NAME" if "sqlite3" in DATABASES["default"]["ENGINE"] else "HOST"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        location: replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["apps.core.replicas.ReplicaRouter"]
+    MIDDLEWARE.append("apps.core.replicas.ReplicaRoutingMiddleware")
+
+# Seconds a client that wrote is kept on the primary, and an unreachable
+# replica is skipped
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+REPLICA_RETRY_SECONDS = config("REPLICA_RETRY_SECONDS", default=30, cast=int)
+
+# wsgi or asgi, as served by gunicorn.conf.py. Under ASGI each request's
+# database work runs on its own thread, so persistent connections are not
+# reused between requests: pool them by default instead.
+SERVER_MODE = config("SERVER_MODE", default="wsgi")
+ASGI_MODE = SERVER_MODE == "asgi"
+
+# Persistent connections: seconds a connection is reused across requests
+# (0 closes it after every request). With DB_POOL, connections are instead
+# returned to an in-process pool at the end of each request, which suits
+# ASGI and threaded workers.
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=0 if ASGI_MODE else 60, cast=int)
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+DB_POOL = config("DB_POOL", default=ASGI_MODE, cast=bool)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", default=10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=10, cast=int)
+
+for database in DATABASES.values():
+    if database["ENGINE"] != "django.db.backends.postgresql":
+        continue
+    database["CONN_HEALTH_CHECKS"] = DB_CONN_HEALTH_CHECKS
+    if DB_POOL:
+        database["ENGINE"] = "apps.core.db.backends.postgresql_pool"
+        database["CONN_MAX_AGE"] = 0
+        database["POOL"] = {"max_size": DB_POOL_MAX_SIZE, "timeout": DB_POOL_TIMEOUT}
+    else:
+        database["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+
+# UUID version of new primary keys: 4 (random) or 7 (time-ordered, so
+# inserts append to the primary key indexes; see apps.core.uuids)
+UUID_PRIMARY_KEY_VERSION = config("UUID_PRIMARY_KEY_VERSION", default=4, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -137,11 +209,20 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Custom User Model
 AUTH_USER_MODEL = "users.User"
 
+# Authentication profile (see apps.users.sessions): "mixed" accepts
+# browser sessions and tokens, "token" authenticates the API with tokens
+# only and keeps sessions for the admin. Token requests never touch the
+# session store in either profile.
+AUTH_PROFILE = config("AUTH_PROFILE", default="mixed")
+TOKEN_AUTH_PROFILE = AUTH_PROFILE == "token"
+SESSION_URL_PREFIXES = ["/admin/"]
+
 # Django REST Framework
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+    "DEFAULT_AUTHENTICATION_CLASSES": (
+        [] if TOKEN_AUTH_PROFILE else ["rest_framework.authentication.SessionAuthentication"]
+    ) + [
+        "apps.users.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -152,6 +233,37 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'apps.organizations.exceptions.custom_exception_handler',
 }
 
+# Cache: Redis when REDIS_URL is set, otherwise per-process memory
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a cached product catalog response is kept
+PRODUCT_CACHE_TTL = config("PRODUCT_CACHE_TTL", default=600, cast=int)
+
+# Delta sync (?updated_since=): days deletions are kept for, and seconds
+# each sync_token is moved back so rows from transactions that were still
+# open (or not yet replicated) when a sync ran are sent again next time
+SYNC_TOMBSTONE_RETENTION_DAYS = config("SYNC_TOMBSTONE_RETENTION_DAYS", default=90, cast=int)
+SYNC_OVERLAP_SECONDS = config("SYNC_OVERLAP_SECONDS", default=30, cast=int)
+
+# Token authentication cache (seconds / entries)
+TOKEN_CACHE_TTL = config("TOKEN_CACHE_TTL", default=300, cast=int)
+TOKEN_CACHE_LOCAL_TTL = config("TOKEN_CACHE_LOCAL_TTL", default=10, cast=int)
+TOKEN_CACHE_LOCAL_SIZE = config("TOKEN_CACHE_LOCAL_SIZE", default=1024, cast=int)
+
 # Spectacular (Swagger/OpenAPI)
 SPECTACULAR_SETTINGS = {
     "TITLE": "Timber BE API",
@@ -160,6 +272,15 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# The schema is generated once per code version (manage.py build_schema or
+# the first request) and stored gzipped here. CODE_VERSION defaults to a
+# hash of the sources. Seconds /api/schema/ may be cached before revalidating.
+# Outside STATIC_ROOT: the image builds the schema, and the staticfiles
+# volume mounted over STATIC_ROOT would hide it.
+CODE_VERSION = config("CODE_VERSION", default="")
+OPENAPI_SCHEMA_DIR = config("OPENAPI_SCHEMA_DIR", default=str(BASE_DIR / "openapi"))
+OPENAPI_SCHEMA_MAX_AGE = config("OPENAPI_SCHEMA_MAX_AGE", default=300, cast=int)
+
 # Email Configuration
 EMAIL_PROVIDER = config("EMAIL_PROVIDER", default="mailtrap")
 MAILTRAP_AUTH_METHOD = config("MAILTRAP_AUTH_METHOD", default="token")
@@ -198,6 +319,42 @@ DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="noreply@timber.app")
 if DEBUG and not EMAIL_HOST_PASSWORD:
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Outbound email queue retries (seconds)
+EMAIL_MAX_RETRIES = config("EMAIL_MAX_RETRIES", default=5, cast=int)
+EMAIL_RETRY_BACKOFF = config("EMAIL_RETRY_BACKOFF", default=30, cast=int)
+EMAIL_RETRY_BACKOFF_MAX = config("EMAIL_RETRY_BACKOFF_MAX", default=1800, cast=int)
+# With Redis, queued emails are sent in batches every EMAIL_BATCH_INTERVAL seconds
+EMAIL_BATCH_INTERVAL = config("EMAIL_BATCH_INTERVAL", default=5, cast=int)
+EMAIL_BATCH_SIZE = config("EMAIL_BATCH_SIZE", default=100, cast=int)
+
+FRONTEND_URL = config("FRONTEND_URL", default="http://localhost:3000")
+
+# Celery: without a broker, tasks run in-process when their transaction commits
+CELERY_BROKER_URL = config("CELERY_BROKER_URL", default=REDIS_URL)
+CELERY_TASK_ALWAYS_EAGER = config(
+    "CELERY_TASK_ALWAYS_EAGER", default=not CELERY_BROKER_URL, cast=bool
+)
+CELERY_TASK_SERIALIZER = "json"
+CELERY_ACCEPT_CONTENT = ["json"]
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Keep the queued JSON log handler configured from LOGGING in workers
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-counters": {
+        "task": "apps.core.tasks.reconcile_counters",
+        "schedule": config("COUNTERS_RECONCILE_INTERVAL", default=3600, cast=int),
+    },
+    "prune-deleted-records": {
+        "task": "apps.organizations.tasks.prune_deleted_records",
+        "schedule": 24 * 60 * 60,
+    },
+    "drain-email-queue": {
+        "task": "apps.users.tasks.drain_email_queue",
+        "schedule": EMAIL_BATCH_INTERVAL,
+    },
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config(
     "CORS_ALLOWED_ORIGINS",
@@ -214,9 +371,18 @@ CORS_ALLOW_ALL_HEADERS = config("CORS_ALLOW_ALL_HEADERS", default=DEBUG, cast=bo
 # Allow all methods for development3
 CORS_ALLOW_ALL_METHODS = config("CORS_ALLOW_ALL_METHODS", default=DEBUG, cast=bool)
 
-# Session Settings
+# Session Settings: kept in the cache (or, without Redis, in a signed
+# cookie) rather than a database row written on every request
+SESSION_ENGINE = config(
+    "SESSION_ENGINE",
+    default="django.contrib.sessions.backends.cache"
+    if REDIS_URL
+    else "django.contrib.sessions.backends.signed_cookies",
+)
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = config(
+    "SESSION_SAVE_EVERY_REQUEST", default=not TOKEN_AUTH_PROFILE, cast=bool
+)
 SESSION_COOKIE_SECURE = config(
     "SESSION_COOKIE_SECURE", default=DEBUG, cast=bool
 )
@@ -227,21 +393,45 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = "DENY"
 
-# Logging
+# Logging: records are queued and written as JSON lines by a background
+# thread per process (see apps.core.logs). LOG_STDOUT also writes them to
+# stdout, for container log collectors.
+LOG_FILE = config("LOG_FILE", default=str(BASE_DIR / "logs" / "django.log"))
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+LOG_MAX_BYTES = config("LOG_MAX_BYTES", default=50 * 1024 * 1024, cast=int)
+LOG_BACKUP_COUNT = config("LOG_BACKUP_COUNT", default=5, cast=int)
+LOG_STDOUT = config("LOG_STDOUT", default=False, cast=bool)
+# Seconds between logged tracebacks of the same 4xx error on the same view
+LOG_CLIENT_ERROR_TRACEBACK_INTERVAL = config(
+    "LOG_CLIENT_ERROR_TRACEBACK_INTERVAL", default=60, cast=int
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "request_context": {
+            "()": "apps.core.logs.RequestContextFilter",
+        },
+    },
     "handlers": {
-        "file": {
-            "level": "INFO",
-            "class": "logging.FileHandler",
-            "filename": BASE_DIR / "logs" / "django.log",
+        "queue": {
+            "level": LOG_LEVEL,
+            "class": "apps.core.logs.BackgroundQueueHandler",
+            "filename": LOG_FILE,
+            "max_bytes": LOG_MAX_BYTES,
+            "backup_count": LOG_BACKUP_COUNT,
+            "stream": LOG_STDOUT,
+            "filters": ["request_context"],
         },
     },
+    "root": {
+        "handlers": ["queue"],
+        "level": LOG_LEVEL,
+    },
     "loggers": {
         "django": {
-            "handlers": ["file"],
-            "level": "INFO",
+            "level": LOG_LEVEL,
             "propagate": True,
         },
     },
@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from drf_spectacular.views import SpectacularRedocView
+from apps.core.schema import SchemaRedocView, SchemaSwaggerView, schema
+from apps.core.views import liveness, metrics, readiness
 
 urlpatterns = [
+    # Probes for load balancers and orchestrators, no authentication
+    path("livez", liveness, name="livez"),
+    path("readyz", readiness, name="readyz"),
+    path("metrics", metrics, name="metrics"),
     path("admin/", admin.site.urls),
     path("api/v1/auth/", include("apps.users.urls")),
     path("api/v1/organizations/", include("apps.organizations.urls")),
@@ -14,15 +18,9 @@ urlpatterns = [
 # Add Swagger/OpenAPI endpoints if enabled
 if settings.ENABLE_SWAGGER:
     urlpatterns += [
-        path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-        path(
-            "api/docs/",
-            SpectacularSwaggerView.as_view(url_name="schema"),
-            name="swagger-ui",
-        ),
-        path(
-            "api/redoc/",
-            SpectacularRedocView.as_view(url_name="schema"),
-            name="redoc",
-        ),
+        # Served from a precomputed artifact, see apps.core.schema
+        path("api/schema/", schema, name="schema"),
+        path("api/schema/<str:version>/", schema, name="schema-versioned"),
+        path("api/docs/", SchemaSwaggerView.as_view(), name="swagger-ui"),
+        path("api/redoc/", SchemaRedocView.as_view(), name="redoc"),
     ]